@@ -1,13 +1,9 @@
 import streamlit as st
-import firebase_admin
-from firebase_admin import credentials, firestore
-from google.cloud.firestore_v1.field_path import FieldPath
 from datetime import datetime, timedelta
-import smtplib
-from email.mime.text import MIMEText
 import time
 import os
 import json
+import calendar
 from PIL import Image
 
 # --- DEFINIÇÃO DE CAMINHOS SEGUROS (PARA O FAVICON) ---
@@ -30,9 +26,6 @@ st.set_page_config(
     layout="wide" # ou "wide", como preferir
 )
 
-EMAIL = os.environ.get("EMAIL_CREDENCIADO")
-SENHA = os.environ.get("EMAIL_SENHA")
-
 # CSS customizado para colorir os botões da tabela e centralizar o texto
 # CSS customizado para criar uma grade de agendamentos visual e responsiva
 st.markdown("""
@@ -95,241 +88,18 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-# --- INICIALIZAÇÃO DO FIREBASE E E-MAIL (Mesmo do código original) ---
-
-@st.cache_resource
-def initialize_firebase():
-    """
-    Inicializa a conexão com o Firebase. A função só é executada uma vez
-    graças ao cache do Streamlit.
-    """
-    try:
-        # 1. Carrega os segredos do Streamlit
-        firebase_secrets = st.secrets["firebase"]
-        
-        # 2. CRIA UMA CÓPIA MUTÁVEL (editável) do dicionário de segredos
-        creds_dict = dict(firebase_secrets)
-        
-        # 3. Agora modificamos a CÓPIA, não o segredo original
-        if 'private_key' in creds_dict:
-            creds_dict['private_key'] = creds_dict['private_key'].replace('\\n', '\n')
-            
-        cred = credentials.Certificate(creds_dict)
-        
-        # Verifica se a app já foi inicializada para evitar erros
-        if not firebase_admin._apps:
-            firebase_admin.initialize_app(cred)
-            print("Firebase inicializado com sucesso via st.secrets!")
-
-    except Exception as e:
-        st.error(f"ERRO CRÍTICO AO CONECTAR COM O FIREBASE! Detalhe: {e}")
-        st.info("Verifique se você configurou o arquivo .streamlit/secrets.toml corretamente.")
-        st.stop()
-
-# 1. CHAMA A FUNÇÃO DE INICIALIZAÇÃO (FORA DELA MESMA)
-initialize_firebase()
-
-# 2. DEFINE O CLIENTE DO FIRESTORE (NO ESCOPO PRINCIPAL)
-#    Agora a variável 'db' estará acessível em todo o seu código.
-db = firestore.client()
+# --- INICIALIZAÇÃO DO FIREBASE E FUNÇÕES DE BACKEND ---
+# Importado depois do set_page_config: a inicialização do Firebase pode exibir mensagens na página.
+from backend import (
+    EMAIL, SENHA, servicos, barbeiros, horarios_tabela, dias_semana_nomes, servicos_visagismo,
+    enviar_email, buscar_agendamentos_do_dia, reservar_agendamento, HorarioIndisponivel,
+    desbloquear_horario, verificar_disponibilidade_especifica, cancelar_agendamento,
+    fechar_horarios, desbloquear_horarios, carregar_regras_fechamento,
+    criar_regra_fechamento, excluir_regra_fechamento, adicionar_excecao_regra,
+    aplicar_regras_fechamento, regra_fecha_horario, descrever_regra, calcular_status_horario, ocupa_horario_seguinte,
+    ocupacao_do_mes
+)
 
-# 3. CARREGA AS CREDENCIAIS DE E-MAIL (TAMBÉM NO ESCOPO PRINCIPAL)
-try:
-    EMAIL = st.secrets["email_credentials"]["email"]
-    SENHA = st.secrets["email_credentials"]["password"]
-except (KeyError, AttributeError):
-    st.error("Credenciais de e-mail não encontradas no secrets.toml. A função de envio de e-mail será desativada.")
-    EMAIL = None
-    SENHA = None
-
-
-# --- DADOS BÁSICOS ---
-servicos = ["Tradicional", "Social", "Degradê", "Pezim", "Navalhado", "Barba", "Abordagem de visagismo", "Consultoria de visagismo"]
-barbeiros = ["Aluizio", "Lucas Borges"]
-
-
-# --- FUNÇÕES DE BACKEND (Adaptadas e Novas) ---
-# VERSÃO CORRETA DA FUNÇÃO
-def enviar_email(assunto, mensagem, email_remetente, senha_remetente):
-    """
-    Envia um e-mail usando as credenciais fornecidas como parâmetros.
-    """
-    if not email_remetente or not senha_remetente:
-        st.warning("Credenciais de e-mail não configuradas para envio.")
-        return
-    try:
-        msg = MIMEText(mensagem)
-        msg['Subject'] = assunto
-        msg['From'] = email_remetente
-        msg['To'] = email_remetente  # Envia para o próprio e-mail como notificação
-
-        with smtplib.SMTP('smtp.gmail.com', 587) as server:
-            server.starttls()
-            # Usa os parâmetros recebidos para fazer o login
-            server.login(email_remetente, senha_remetente)
-            server.sendmail(email_remetente, email_remetente, msg.as_string())
-    except Exception as e:
-        st.error(f"Erro ao enviar e-mail: {e}")
-
-def buscar_agendamentos_do_dia(data_obj):
-    """
-    Busca todos os agendamentos do dia em UMA ÚNICA CONSULTA e retorna um dicionário.
-    A chave é o ID do documento, e o valor são os dados do agendamento.
-    """
-    if not db:
-        st.error("Firestore não inicializado.")
-        return {}
-    
-    ocupados_map = {}
-    prefixo_id = data_obj.strftime('%Y-%m-%d')
-    try:
-        docs = db.collection('agendamentos') \
-                 .order_by(FieldPath.document_id()) \
-                 .start_at([prefixo_id]) \
-                 .end_at([prefixo_id + '\uf8ff']) \
-                 .stream()
-        for doc in docs:
-            ocupados_map[doc.id] = doc.to_dict()
-    except Exception as e:
-        st.error(f"Erro ao buscar agendamentos do dia: {e}")
-    return ocupados_map
-
-# FUNÇÕES DE ESCRITA (JÁ CORRIGIDAS NA NOSSA CONVERSA)
-def salvar_agendamento(data_obj, horario, nome, telefone, servicos, barbeiro):
-    if not db: return False
-    data_para_id = data_obj.strftime('%Y-%m-%d')
-    chave_agendamento = f"{data_para_id}_{horario}_{barbeiro}"
-    try:
-        # CORREÇÃO: Converte o objeto 'date' para 'datetime' antes de salvar
-        data_para_salvar = datetime.combine(data_obj, datetime.min.time())
-        db.collection('agendamentos').document(chave_agendamento).set({
-            'nome': nome, 'telefone': telefone, 'servicos': servicos,
-            'barbeiro': barbeiro, 'data': data_para_salvar, 'horario': horario
-        })
-        return True
-    except Exception as e:
-        st.error(f"Erro ao salvar agendamento: {e}")
-        return False
-
-def bloquear_horario(data_obj, horario, barbeiro, motivo="BLOQUEADO"):
-    if not db: return False
-    data_para_id = data_obj.strftime('%Y-%m-%d')
-    chave_bloqueio = f"{data_para_id}_{horario}_{barbeiro}_BLOQUEADO" if motivo == "BLOQUEADO" else f"{data_para_id}_{horario}_{barbeiro}"
-    try:
-        # CORREÇÃO: Converte o objeto 'date' para 'datetime' antes de salvar
-        data_para_salvar = datetime.combine(data_obj, datetime.min.time())
-        db.collection('agendamentos').document(chave_bloqueio).set({
-            'nome': motivo, 'telefone': "INTERNO", 'servicos': [], 
-            'barbeiro': barbeiro, 'data': data_para_salvar, 'horario': horario
-        })
-        return True
-    except Exception as e:
-        st.error(f"Erro ao bloquear horário: {e}")
-        return False
-        
-# ADICIONE ESTA FUNÇÃO JUNTO COM AS OUTRAS FUNÇÕES DE BACKEND
-
-def desbloquear_horario(data_obj, horario_agendado, barbeiro):
-    """
-    Remove o documento de bloqueio (_BLOQUEADO) referente a um agendamento de Corte+Barba.
-    """
-    if not db: return
-    try:
-        # Calcula o horário seguinte que foi bloqueado
-        horario_dt = datetime.strptime(horario_agendado, '%H:%M') + timedelta(minutes=30)
-        horario_seguinte_str = horario_dt.strftime('%H:%M')
-        
-        # Cria o ID do documento de bloqueio no formato correto
-        data_para_id = data_obj.strftime('%Y-%m-%d')
-        chave_bloqueio = f"{data_para_id}_{horario_seguinte_str}_{barbeiro}_BLOQUEADO"
-        
-        # Deleta o documento
-        bloqueio_ref = db.collection('agendamentos').document(chave_bloqueio)
-        if bloqueio_ref.get().exists:
-            bloqueio_ref.delete()
-    except Exception as e:
-        # Apenas avisa no console, não precisa mostrar erro para o usuário
-        print(f"Aviso: Não foi possível desbloquear o horário seguinte. {e}")
-
-def verificar_disponibilidade_especifica(data_obj, horario, barbeiro):
-    """ Verifica de forma eficiente se um único horário está livre. """
-    if not db: return False
-    data_para_id = data_obj.strftime('%Y-%m-%d')
-    id_padrao = f"{data_para_id}_{horario}_{barbeiro}"
-    id_bloqueado = f"{data_para_id}_{horario}_{barbeiro}_BLOQUEADO"
-    try:
-        doc_padrao_ref = db.collection('agendamentos').document(id_padrao)
-        doc_bloqueado_ref = db.collection('agendamentos').document(id_bloqueado)
-        
-        # Se qualquer um dos dois documentos existir, o horário não está livre.
-        if doc_padrao_ref.get().exists or doc_bloqueado_ref.get().exists:
-            return False # Indisponível
-        return True # Disponível
-    except Exception:
-        return False
-
-def cancelar_agendamento(data_obj, horario, barbeiro):
-    if not db: return None
-    data_para_id = data_obj.strftime('%Y-%m-%d')
-    chave_agendamento = f"{data_para_id}_{horario}_{barbeiro}"
-    agendamento_ref = db.collection('agendamentos').document(chave_agendamento)
-    try:
-        doc = agendamento_ref.get()
-        if doc.exists:
-            agendamento_data = doc.to_dict()
-            agendamento_ref.delete()
-            return agendamento_data
-        return None
-    except Exception as e:
-        st.error(f"Erro ao cancelar agendamento: {e}")
-        return None
-
-def fechar_horario(data_obj, horario, barbeiro):
-    if not db: return False
-    data_para_id = data_obj.strftime('%Y-%m-%d')
-    chave_bloqueio = f"{data_para_id}_{horario}_{barbeiro}"
-    try:
-        # CORREÇÃO: Converte o objeto 'date' para 'datetime' antes de salvar
-        data_para_salvar = datetime.combine(data_obj, datetime.min.time())
-        db.collection('agendamentos').document(chave_bloqueio).set({
-            'nome': "Fechado", 'telefone': "INTERNO", 'servicos': [],
-            'barbeiro': barbeiro, 'data': data_para_salvar, 'horario': horario
-        })
-        return True
-    except Exception as e:
-        st.error(f"Erro ao fechar horário: {e}")
-        return False
-    # ADICIONE ESTA NOVA FUNÇÃO NO SEU BLOCO DE FUNÇÕES DE BACKEND
-
-# NO SEU ARQUIVO agn.py, SUBSTITUA ESTA FUNÇÃO:
-
-def desbloquear_horario_especifico(data_obj, horario, barbeiro):
-    """
-    Remove um agendamento/bloqueio específico, tentando apagar tanto o ID
-    padrão quanto o ID com sufixo _BLOQUEADO para garantir a limpeza.
-    """
-    if not db: return False
-    
-    data_para_id = data_obj.strftime('%Y-%m-%d')
-    
-    # Define os dois possíveis nomes de documento que podem estar ocupando o horário
-    chave_padrao = f"{data_para_id}_{horario}_{barbeiro}"
-    chave_bloqueado = f"{data_para_id}_{horario}_{barbeiro}_BLOQUEADO"
-    
-    ref_padrao = db.collection('agendamentos').document(chave_padrao)
-    ref_bloqueado = db.collection('agendamentos').document(chave_bloqueado)
-    
-    try:
-        # Tenta apagar os dois documentos. O Firestore não gera erro se o documento não existir.
-        # Isso garante que tanto um agendamento normal quanto um bloqueio órfão sejam removidos.
-        ref_padrao.delete()
-        ref_bloqueado.delete()
-        
-        return True # Retorna sucesso, pois a intenção é deixar o horário livre.
-        
-    except Exception as e:
-        st.error(f"Erro ao tentar desbloquear horário: {e}")
-        return False
 
 # --- INICIALIZAÇÃO DO ESTADO DA SESSÃO ---
 if 'view' not in st.session_state:
@@ -363,7 +133,7 @@ if st.session_state.view == 'agendar':
         servicos_selecionados = st.multiselect("Serviços", servicos, key="servicos_selecionados")
 
         # Sua validação de Visagismo (mantida)
-        is_visagismo = any(s in servicos_selecionados for s in ["Abordagem de visagismo", "Consultoria de visagismo"])
+        is_visagismo = any(s in servicos_selecionados for s in servicos_visagismo)
         if is_visagismo and barbeiro == 'Aluizio':
             st.error("Serviços de visagismo são apenas com Lucas Borges.")
         else:
@@ -374,21 +144,26 @@ if st.session_state.view == 'agendar':
                 else:
                     with st.spinner("Processando..."):
                         # Sua lógica de bloquear o próximo horário (mantida e corrigida)
-                        precisa_bloquear_proximo = False
-                        if "Barba" in servicos_selecionados and any(c in servicos_selecionados for c in ["Tradicional", "Social", "Degradê", "Navalhado"]):
+                        if ocupa_horario_seguinte(servicos_selecionados):
                             horario_seguinte_dt = datetime.strptime(horario, '%H:%M') + timedelta(minutes=30)
                             horario_seguinte_str = horario_seguinte_dt.strftime('%H:%M')
-                            if verificar_disponibilidade_especifica(data_obj, horario_seguinte_str, barbeiro):
-                                precisa_bloquear_proximo = True
-                            else:
+                            if horario_seguinte_str not in horarios_tabela or not verificar_disponibilidade_especifica(data_obj, horario_seguinte_str, barbeiro):
                                 st.error("Não é possível agendar Corte+Barba. O horário seguinte não está disponível.")
                                 st.stop()
 
-                        # Chamada da função de salvar com a variável correta (data_obj)
-                        if salvar_agendamento(data_obj, horario, nome_cliente, "INTERNO", servicos_selecionados, barbeiro):
-                            if precisa_bloquear_proximo:
-                                bloquear_horario(data_obj, horario_seguinte_str, barbeiro, "BLOQUEADO")
-
+                        # Agendamento e bloqueio do horário seguinte numa única gravação, sem sobrescrever
+                        # um horário ocupado enquanto esta tela estava aberta (ex.: pela API)
+                        try:
+                            reservar_agendamento(data_obj, horario, nome_cliente, "INTERNO", servicos_selecionados, barbeiro)
+                            agendamento_salvo = True
+                        except HorarioIndisponivel:
+                            st.error("Horário indisponível. Ele foi ocupado por outro agendamento; volte para a agenda.")
+                            st.stop()
+                        except Exception as e:
+                            st.error(f"Erro ao salvar agendamento: {e}")
+                            agendamento_salvo = False
+
+                        if agendamento_salvo:
                             st.success(f"Agendamento para {nome_cliente} confirmado!")
                             
                             # E-mail enviado com a data formatada corretamente
@@ -461,7 +236,7 @@ elif st.session_state.view == 'cancelar':
             if dados_cancelados:
                 # Se o horário foi liberado com sucesso, verificamos se precisa desbloquear o seguinte
                 servicos = dados_cancelados.get('servicos', [])
-                if "Barba" in servicos and any(c in servicos for c in ["Tradicional", "Social", "Degradê", "Navalhado"]):
+                if ocupa_horario_seguinte(servicos):
                     desbloquear_horario(data_obj, horario, barbeiro)
 
                 st.success("Horário liberado com sucesso!")
@@ -528,14 +303,8 @@ elif st.session_state.view == 'fechar':
                 else:
                     with st.spinner(f"Fechando horários para {barbeiro_fechar}..."):
                         horarios_para_fechar = horarios_tabela[start_index:end_index+1]
-                        sucesso_total = True
-                        for horario in horarios_para_fechar:
-                            # --- USAMOS data_obj_para_fechar AQUI ---
-                            if not fechar_horario(data_obj_para_fechar, horario, barbeiro_fechar):
-                                sucesso_total = False
-                                break
-                        
-                        if sucesso_total:
+                        # --- USAMOS data_obj_para_fechar AQUI (todo o intervalo em uma única gravação) ---
+                        if fechar_horarios(data_obj_para_fechar, horarios_para_fechar, barbeiro_fechar):
                             st.success("Horários fechados com sucesso!")
                             st.cache_data.clear()
                             st.session_state.view = 'agenda' # <-- Corrigido para 'agenda'
@@ -558,6 +327,45 @@ else:
     with cols_logo[1]:
         st.image("https://github.com/barbearialb/sistemalb/blob/main/icone.png?raw=true", width=350)
 
+    # --- CALENDÁRIO DE OCUPAÇÃO DO MÊS ---
+    # Mostra agendados/livres por barbeiro em cada dia do mês da data selecionada
+    data_referencia = st.session_state.get('data_input') or datetime.today().date()
+    hoje = datetime.today().date()
+    with st.expander(f"📆 Ocupação do Mês ({data_referencia.month:02d}/{data_referencia.year})", expanded=True):
+        ocupacao_mes = ocupacao_do_mes(data_referencia.year, data_referencia.month)
+        linhas_calendario = ""
+        for semana in calendar.monthcalendar(data_referencia.year, data_referencia.month):
+            celulas = ""
+            for dia in semana:
+                if dia == 0:
+                    celulas += "<td></td>"
+                    continue
+                data_dia = data_referencia.replace(day=dia)
+                contagens = ocupacao_mes.get(data_dia, {})
+                total_agendados = sum(agendados for agendados, _ in contagens.values())
+                total_horarios = sum(agendados + livres for agendados, livres in contagens.values())
+                if total_horarios == 0:
+                    cor_fundo = '#A9A9A9'  # Cinza claro (dia fechado)
+                else:
+                    cor_fundo = f"rgba(220, 53, 69, {0.15 + 0.85 * total_agendados / total_horarios:.2f})"  # Vermelho, mais forte quanto mais cheio
+                opacidade = 0.45 if data_dia < hoje else 1
+                borda = "2px solid #FCA311" if data_dia == data_referencia else "1px solid #1B263B"
+                detalhes = "<br>".join(f"{barbeiro.split()[0]}: {agendados}/{livres}" for barbeiro, (agendados, livres) in contagens.items())
+                celulas += (
+                    f"<td style='background-color: {cor_fundo}; opacity: {opacidade}; border: {borda}; "
+                    f"border-radius: 6px; padding: 4px; vertical-align: top; font-size: 12px;'>"
+                    f"<b>{dia}</b><br><span style='font-size: 10px;'>{detalhes}</span></td>"
+                )
+            linhas_calendario += f"<tr>{celulas}</tr>"
+
+        cabecalho_calendario = "".join(f"<th style='text-align: center;'>{nome[:3]}</th>" for nome in dias_semana_nomes)
+        st.markdown(f"""
+            <table style='width: 100%; table-layout: fixed; border-collapse: separate; border-spacing: 3px;'>
+                <tr>{cabecalho_calendario}</tr>{linhas_calendario}
+            </table>
+        """, unsafe_allow_html=True)
+        st.caption("Agendados / livres por barbeiro. Quanto mais vermelho, mais cheio o dia; cinza = sem horários livres nem agendamentos.")
+
     data_selecionada = st.date_input(
         "Selecione a data para visualizar",
         value=datetime.today(),
@@ -592,11 +400,11 @@ else:
                         st.error("O horário de início deve ser anterior ao final.")
                     else:
                         horarios_para_fechar = horarios_tabela[start_index:end_index+1]
-                        for horario in horarios_para_fechar:
-                            fechar_horario(data_obj, horario, barbeiro_fechar)
-                        st.success("Horários fechados com sucesso!")
-                        time.sleep(1)
-                        st.rerun()
+                        # O intervalo é gravado de uma vez: se a gravação falhar, nenhum horário foi fechado
+                        if fechar_horarios(data_obj, horarios_para_fechar, barbeiro_fechar):
+                            st.success("Horários fechados com sucesso!")
+                            time.sleep(1)
+                            st.rerun()
                 except Exception as e:
                     st.error(f"Erro ao fechar horários: {e}")
 
@@ -614,16 +422,67 @@ else:
 
             if st.form_submit_button("Confirmar Desbloqueio", use_container_width=True):
                 horarios_para_desbloquear = horarios_tabela[horarios_tabela.index(horario_inicio_desbloq):horarios_tabela.index(horario_fim_desbloq)+1]
-                for horario in horarios_para_desbloquear:
-                    desbloquear_horario_especifico(data_obj, horario, barbeiro_desbloquear)
-                st.success("Horários desbloqueados com sucesso!")
-                time.sleep(1)
-                st.rerun()
+                # Se a gravação falhar o erro já foi exibido e nenhum horário foi desbloqueado
+                if desbloquear_horarios(data_obj, horarios_para_desbloquear, barbeiro_desbloquear):
+                    # Horários fechados por regra recorrente não têm documento para apagar
+                    regras_ativas = carregar_regras_fechamento().values()
+                    horarios_com_regra = [
+                        horario for horario in horarios_para_desbloquear
+                        if any(regra_fecha_horario(regra, data_obj, horario, barbeiro_desbloquear) for regra in regras_ativas)
+                    ]
+                    if horarios_com_regra:
+                        st.warning(
+                            f"Os horários {', '.join(horarios_com_regra)} continuam fechados por uma regra recorrente. "
+                            "Use 'Liberar dia' em '🔁 Fechamentos Recorrentes' para liberar esta data."
+                        )
+                    else:
+                        st.success("Horários desbloqueados com sucesso!")
+                        time.sleep(1)
+                        st.rerun()
+
+    with st.expander("🔁 Fechamentos Recorrentes"):
+        with st.form("form_regra_fechamento", clear_on_submit=True):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                regra_inicio = st.selectbox("Início", options=horarios_tabela, key="regra_inicio")
+            with col2:
+                regra_fim = st.selectbox("Fim", options=horarios_tabela, key="regra_fim", index=len(horarios_tabela)-1)
+            with col3:
+                regra_barbeiro = st.selectbox("Barbeiro", options=barbeiros, key="regra_barbeiro")
+
+            regra_dias = st.multiselect("Dias da semana (vazio = todos os dias do período)", options=list(range(7)),
+                                        format_func=lambda d: dias_semana_nomes[d], key="regra_dias")
+            col4, col5 = st.columns(2)
+            with col4:
+                regra_data_inicio = st.date_input("A partir de", value=data_obj, key="regra_data_inicio")
+            with col5:
+                regra_data_fim = st.date_input("Até (opcional)", value=None, key="regra_data_fim")
+
+            if st.form_submit_button("Criar Regra", use_container_width=True):
+                if horarios_tabela.index(regra_inicio) > horarios_tabela.index(regra_fim):
+                    st.error("O horário de início deve ser anterior ao final.")
+                elif regra_data_fim and regra_data_fim < regra_data_inicio:
+                    st.error("A data final deve ser posterior à data inicial.")
+                elif criar_regra_fechamento(regra_barbeiro, regra_inicio, regra_fim, regra_data_inicio, regra_data_fim, regra_dias):
+                    st.success("Regra de fechamento criada!")
+                    time.sleep(1)
+                    st.rerun()
+
+        regras_existentes = carregar_regras_fechamento()
+        for regra_id, regra in regras_existentes.items():
+            regra_cols = st.columns([4, 1, 1])
+            regra_cols[0].write(descrever_regra(regra))
+            if regra_cols[1].button("Liberar dia", key=f"regra_excecao_{regra_id}", help=f"Libera {data_str} nesta regra", use_container_width=True):
+                if adicionar_excecao_regra(regra_id, data_obj):
+                    st.rerun()
+            if regra_cols[2].button("🗑️ Excluir", key=f"regra_excluir_{regra_id}", use_container_width=True):
+                if excluir_regra_fechamento(regra_id):
+                    st.rerun()
 
     # --- OTIMIZAÇÃO DE CARREGAMENTO ---
     # 1. Busca todos os dados do dia de uma só vez, antes de desenhar a tabela
-    ocupados_map = buscar_agendamentos_do_dia(data_obj)
-    data_para_id = data_obj.strftime('%Y-%m-%d') # Formato AAAA-MM-DD para checar os IDs
+    #    e sobrepõe as regras de fechamento recorrentes (documentos explícitos têm prioridade)
+    ocupados_map = aplicar_regras_fechamento(data_obj, buscar_agendamentos_do_dia(data_obj), carregar_regras_fechamento())
 
     # Header da Tabela
     header_cols = st.columns([1.5, 3, 3])
@@ -639,63 +498,7 @@ else:
         grid_cols[0].markdown(f"#### {horario}")
 
         for i, barbeiro in enumerate(barbeiros):
-            status = "disponivel"
-            texto_botao = "Disponível"
-            dados_agendamento = {}
-            is_clicavel = True
-
-            # --- LÓGICA SDJ ADICIONADA AQUI ---
-            dia_mes = data_obj.day
-            mes_ano = data_obj.month
-            dia_semana = data_obj.weekday() # 0=Segunda, 6=Domingo
-            is_intervalo_especial = (mes_ano == 7 and 10 <= dia_mes <= 19)
-            
-            hora_int = int(horario.split(':')[0])
-
-            # REGRA 0: DURANTE O INTERVALO ESPECIAL, QUASE TUDO É LIBERADO
-            if is_intervalo_especial:
-                # Durante o intervalo, a única regra é verificar agendamentos no banco
-                id_padrao = f"{data_para_id}_{horario}_{barbeiro}"
-                id_bloqueado = f"{data_para_id}_{horario}_{barbeiro}_BLOQUEADO"
-                if id_padrao in ocupados_map:
-                    dados_agendamento = ocupados_map[id_padrao]
-                    nome = dados_agendamento.get("nome", "Ocupado")
-                    status, texto_botao = ("fechado" if nome == "Fechado" else "ocupado"), nome
-                elif id_bloqueado in ocupados_map:
-                    status, texto_botao, dados_agendamento = "ocupado", "Bloqueado", {"nome": "BLOQUEADO"}
-
-            # REGRAS PARA DIAS NORMAIS (FORA DO INTERVALO ESPECIAL)
-            else:
-                # REGRA 1: Horários das 7h (SDJ)
-                id_padrao = f"{data_para_id}_{horario}_{barbeiro}"
-                id_bloqueado = f"{data_para_id}_{horario}_{barbeiro}_BLOQUEADO"
-
-                if id_padrao in ocupados_map:
-                    dados_agendamento = ocupados_map[id_padrao]
-                    nome = dados_agendamento.get("nome", "Ocupado")
-                    # A verificação de "Fechado" agora acontece ANTES da regra de almoço.
-                    if nome == "Fechado":
-                        status, texto_botao, is_clicavel = "fechado", "Fechado", False
-                    elif nome == "Almoço": # Mantém a possibilidade de fechar como almoço em dias especiais
-                        status, texto_botao, is_clicavel = "almoco", "Almoço", False
-                    else: # Se for qualquer outro nome, é um agendamento normal
-                        status, texto_botao = "ocupado", nome
-
-                elif id_bloqueado in ocupados_map:
-                    status, texto_botao, dados_agendamento = "ocupado", "Bloqueado", {"nome": "BLOQUEADO"}
-
-                # 2. SE NÃO HOUVER NADA NO BANCO para este horário, aplicamos as regras fixas do sistema.
-                elif horario in ["07:00", "07:30"]:
-                    status, texto_botao, is_clicavel = "indisponivel", "SDJ", False
-                
-                elif horario == "08:00" and barbeiro == "Lucas Borges":
-                    status, texto_botao, is_clicavel = "indisponivel", "Indisponível", False
-                
-                elif dia_semana == 6: # Domingo
-                    status, texto_botao, is_clicavel = "fechado", "Fechado", False
-
-                elif dia_semana < 5 and hora_int in [12, 13]: # Almoço
-                     status, texto_botao, is_clicavel = "almoco", "Almoço", False
+            status, texto_botao, dados_agendamento, is_clicavel = calcular_status_horario(data_obj, horario, barbeiro, ocupados_map)
 
             # --- SEU CÓDIGO ORIGINAL DE BOTÕES RESTAURADO E ADAPTADO ---
             key = f"btn_{data_str}_{horario}_{barbeiro}"
@@ -0,0 +1,222 @@
+"""
+API JSON de disponibilidade do Atendibarber.
+
+Expõe a mesma lógica de horários da interface (backend.py) para consumidores externos
+(bot de WhatsApp, página pública de agendamento, PWA) sem rodar o script do Streamlit.
+
+    GET  /disponibilidade?data=AAAA-MM-DD&dias=7
+    POST /agendamentos  {"data", "horario", "barbeiro", "nome", "telefone", "servicos"}
+
+As respostas de disponibilidade trazem ETag derivado das versões dos dias e das regras
+de fechamento: o cliente revalida com If-None-Match e recebe 304 enquanto nada mudar.
+
+Executar com:  python api.py  (porta em PORT, padrão 8000; usa o mesmo .streamlit/secrets.toml).
+
+O POST fica desativado por padrão. Com API_TOKEN definido ele exige o cabeçalho
+"Authorization: Bearer <token>"; para aceitar agendamentos sem token é preciso
+optar explicitamente com API_PUBLICO=1.
+O cabeçalho CORS só é enviado para as origens listadas em API_ORIGENS (separadas por vírgula).
+"""
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import backend
+
+DIAS_MAXIMOS = 7
+TAMANHO_MAXIMO_CORPO = 16 * 1024  # bytes
+API_TOKEN = os.environ.get("API_TOKEN")
+API_PUBLICO = os.environ.get("API_PUBLICO") == "1"
+API_ORIGENS = {origem.strip() for origem in os.environ.get("API_ORIGENS", "").split(",") if origem.strip()}
+
+# Corpos já serializados, indexados pelo ETag: enquanto as versões não mudam,
+# a mesma consulta é respondida sem recalcular a grade.
+_respostas = {}
+_respostas_lock = threading.Lock()
+_RESPOSTAS_MAXIMAS = 512
+
+
+def calcular_etag(data_inicio, versoes_dias, versao_regras):
+    chave = f"{data_inicio.isoformat()}|{len(versoes_dias)}|{versao_regras}|" + "|".join(str(v) for v in versoes_dias)
+    return '"' + hashlib.sha1(chave.encode()).hexdigest()[:20] + '"'
+
+
+def disponibilidade_do_dia(data_obj, ocupados_map, regras):
+    """ Monta a disponibilidade de um dia sem expor dados de clientes (apenas o status). """
+    mapa = backend.aplicar_regras_fechamento(data_obj, ocupados_map, regras)
+    return {
+        'data': data_obj.strftime('%Y-%m-%d'),
+        'barbeiros': {
+            barbeiro: [
+                {'horario': horario, 'status': backend.calcular_status_horario(data_obj, horario, barbeiro, mapa)[0]}
+                for horario in backend.horarios_tabela
+            ]
+            for barbeiro in backend.barbeiros
+        }
+    }
+
+
+class AtendibarberHandler(BaseHTTPRequestHandler):
+    server_version = "AtendibarberAPI/1.0"
+    protocol_version = "HTTP/1.1"
+
+    # --- RESPOSTAS ---
+    def _enviar(self, codigo, corpo=b"", cabecalhos=None):
+        self.send_response(codigo)
+        origem = self.headers.get("Origin")
+        if origem and origem in API_ORIGENS:
+            self.send_header("Access-Control-Allow-Origin", origem)
+        self.send_header("Vary", "Origin")
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        if corpo and self.command != "HEAD":
+            self.wfile.write(corpo)
+
+    def _enviar_json(self, codigo, dados, cabecalhos=None):
+        corpo = json.dumps(dados, ensure_ascii=False).encode("utf-8")
+        self._enviar(codigo, corpo, {"Content-Type": "application/json; charset=utf-8", **(cabecalhos or {})})
+
+    # --- ROTAS ---
+    def do_OPTIONS(self):
+        self._enviar(204, cabecalhos={
+            "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+            "Access-Control-Allow-Headers": "Content-Type, Authorization, If-None-Match",
+            "Access-Control-Expose-Headers": "ETag",
+            "Access-Control-Max-Age": "86400"
+        })
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/disponibilidade":
+            return self._enviar_json(404, {'erro': "Rota não encontrada."})
+
+        params = parse_qs(url.query)
+        try:
+            data_inicio = datetime.strptime(params.get('data', [date.today().isoformat()])[0], '%Y-%m-%d').date()
+            dias = int(params.get('dias', ["1"])[0])
+        except ValueError:
+            return self._enviar_json(400, {'erro': "Use data=AAAA-MM-DD e dias inteiro."})
+        if not 1 <= dias <= DIAS_MAXIMOS:
+            return self._enviar_json(400, {'erro': f"'dias' deve estar entre 1 e {DIAS_MAXIMOS}."})
+
+        datas = [data_inicio + timedelta(days=i) for i in range(dias)]
+        versao_regras, regras = backend.carregar_regras_com_versao()
+        dias_carregados = [backend.buscar_dia_com_versao(d) for d in datas]
+        versoes_dias = [versao for versao, _ in dias_carregados]
+        if versao_regras is None or None in versoes_dias:
+            return self._enviar_json(503, {'erro': "Não foi possível consultar a agenda. Tente novamente."})
+
+        etag = calcular_etag(data_inicio, versoes_dias, versao_regras)
+        cabecalhos = {"ETag": etag, "Cache-Control": "no-cache"}
+        if_none_match = self.headers.get("If-None-Match", "")
+        if etag in [t.strip() for t in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return self._enviar(304, cabecalhos=cabecalhos)
+
+        with _respostas_lock:
+            corpo = _respostas.get(etag)
+        if corpo is None:
+            resposta = {'dias': [disponibilidade_do_dia(d, ocupados, regras) for d, (_, ocupados) in zip(datas, dias_carregados)]}
+            corpo = json.dumps(resposta, ensure_ascii=False).encode("utf-8")
+            with _respostas_lock:
+                if len(_respostas) >= _RESPOSTAS_MAXIMAS:
+                    _respostas.clear()
+                _respostas[etag] = corpo
+
+        self._enviar(200, corpo, {"Content-Type": "application/json; charset=utf-8", **cabecalhos})
+
+    do_HEAD = do_GET
+
+    def do_POST(self):
+        # Respostas dadas antes de ler o corpo encerram a conexão, para que os bytes
+        # não lidos não sejam interpretados como a próxima requisição.
+        if urlparse(self.path).path != "/agendamentos":
+            self.close_connection = True
+            return self._enviar_json(404, {'erro': "Rota não encontrada."})
+        if API_TOKEN:
+            if self.headers.get("Authorization") != f"Bearer {API_TOKEN}":
+                self.close_connection = True
+                return self._enviar_json(401, {'erro': "Não autorizado."})
+        elif not API_PUBLICO:
+            self.close_connection = True
+            return self._enviar_json(403, {'erro': "Agendamento pela API desativado (defina API_TOKEN ou API_PUBLICO=1)."})
+
+        try:
+            tamanho = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            tamanho = -1
+        if not 0 <= tamanho <= TAMANHO_MAXIMO_CORPO:
+            self.close_connection = True
+            return self._enviar_json(413 if tamanho > 0 else 400, {'erro': "Content-Length inválido ou grande demais."})
+
+        try:
+            pedido = json.loads(self.rfile.read(tamanho) or b"{}")
+            data_obj = datetime.strptime(pedido['data'], '%Y-%m-%d').date()
+            horario = pedido['horario']
+            barbeiro = pedido['barbeiro']
+            nome = str(pedido.get('nome', "")).strip()
+            telefone = str(pedido.get('telefone', ""))
+            servicos_selecionados = list(pedido.get('servicos', []))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return self._enviar_json(400, {'erro': "Corpo inválido. Envie JSON com data, horario, barbeiro e nome."})
+
+        # Mesmas validações da tela de agendamento
+        if barbeiro not in backend.barbeiros or horario not in backend.horarios_tabela:
+            return self._enviar_json(400, {'erro': "Barbeiro ou horário inválido."})
+        if data_obj < date.today():
+            return self._enviar_json(400, {'erro': "Não é possível agendar em datas passadas."})
+        if not nome:
+            return self._enviar_json(400, {'erro': "O nome do cliente é obrigatório!"})
+        if any(s not in backend.servicos for s in servicos_selecionados):
+            return self._enviar_json(400, {'erro': "Serviço inválido."})
+        if any(s in servicos_selecionados for s in backend.servicos_visagismo) and barbeiro == 'Aluizio':
+            return self._enviar_json(400, {'erro': "Serviços de visagismo são apenas com Lucas Borges."})
+
+        _, ocupados = backend.buscar_dia_com_versao(data_obj)
+        mapa = backend.aplicar_regras_fechamento(data_obj, ocupados, backend.carregar_regras_fechamento())
+        status = backend.calcular_status_horario(data_obj, horario, barbeiro, mapa)[0]
+        if status != "disponivel" or not backend.verificar_disponibilidade_especifica(data_obj, horario, barbeiro):
+            return self._enviar_json(409, {'erro': "Horário indisponível."})
+
+        if backend.ocupa_horario_seguinte(servicos_selecionados):
+            horario_seguinte_str = (datetime.strptime(horario, '%H:%M') + timedelta(minutes=30)).strftime('%H:%M')
+            # O último horário do dia não tem horário seguinte para bloquear
+            if horario_seguinte_str not in backend.horarios_tabela or \
+                    not backend.verificar_disponibilidade_especifica(data_obj, horario_seguinte_str, barbeiro):
+                return self._enviar_json(409, {'erro': "Não é possível agendar Corte+Barba. O horário seguinte não está disponível."})
+
+        # As checagens acima dão mensagens melhores; a transação é o que garante
+        # que dois pedidos simultâneos não fiquem com o mesmo horário.
+        try:
+            backend.reservar_agendamento(data_obj, horario, nome, telefone, servicos_selecionados, barbeiro)
+        except backend.HorarioIndisponivel:
+            return self._enviar_json(409, {'erro': "Horário indisponível."})
+        except Exception as e:
+            print(f"Erro ao salvar agendamento pela API: {e}")
+            return self._enviar_json(500, {'erro': "Falha ao salvar. Tente novamente."})
+
+        data_str_display = data_obj.strftime('%d/%m/%Y')
+        backend.enviar_email(
+            f"Novo Agendamento: {nome} em {data_str_display}",
+            f"Agendamento via API:\n\nCliente: {nome}\nData: {data_str_display}\n"
+            f"Horário: {horario}\nBarbeiro: {barbeiro}\n"
+            f"Serviços: {', '.join(servicos_selecionados) if servicos_selecionados else 'Nenhum'}",
+            backend.EMAIL, backend.SENHA
+        )
+        self._enviar_json(201, {'data': pedido['data'], 'horario': horario, 'barbeiro': barbeiro})
+
+
+def main():
+    porta = int(os.environ.get("PORT", "8000"))
+    servidor = ThreadingHTTPServer(("0.0.0.0", porta), AtendibarberHandler)
+    print(f"API de disponibilidade ouvindo na porta {porta}")
+    servidor.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
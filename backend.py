@@ -0,0 +1,851 @@
+"""
+Funções de backend do Atendibarber (Firestore, cache dos dias, regras de fechamento
+e cálculo do status dos horários). Compartilhadas pela interface do Streamlit (agn.py)
+e pela API JSON de disponibilidade (api.py).
+"""
+import streamlit as st
+import firebase_admin
+from firebase_admin import credentials, firestore
+from google.cloud.firestore_v1.field_path import FieldPath
+from google.cloud.firestore_v1.base_query import FieldFilter
+from google.api_core.exceptions import NotFound
+from datetime import datetime, date, timedelta, timezone
+import calendar
+import smtplib
+from email.mime.text import MIMEText
+import time
+import os
+import threading
+
+EMAIL = os.environ.get("EMAIL_CREDENCIADO")
+SENHA = os.environ.get("EMAIL_SENHA")
+
+
+# --- INICIALIZAÇÃO DO FIREBASE E E-MAIL (Mesmo do código original) ---
+
+@st.cache_resource
+def initialize_firebase():
+    """
+    Inicializa a conexão com o Firebase. A função só é executada uma vez
+    graças ao cache do Streamlit.
+    """
+    try:
+        # 1. Carrega os segredos do Streamlit
+        firebase_secrets = st.secrets["firebase"]
+        
+        # 2. CRIA UMA CÓPIA MUTÁVEL (editável) do dicionário de segredos
+        creds_dict = dict(firebase_secrets)
+        
+        # 3. Agora modificamos a CÓPIA, não o segredo original
+        if 'private_key' in creds_dict:
+            creds_dict['private_key'] = creds_dict['private_key'].replace('\\n', '\n')
+            
+        cred = credentials.Certificate(creds_dict)
+        
+        # Verifica se a app já foi inicializada para evitar erros
+        if not firebase_admin._apps:
+            firebase_admin.initialize_app(cred)
+            print("Firebase inicializado com sucesso via st.secrets!")
+
+    except Exception as e:
+        st.error(f"ERRO CRÍTICO AO CONECTAR COM O FIREBASE! Detalhe: {e}")
+        st.info("Verifique se você configurou o arquivo .streamlit/secrets.toml corretamente.")
+        st.stop()
+
+# 1. CHAMA A FUNÇÃO DE INICIALIZAÇÃO (FORA DELA MESMA)
+initialize_firebase()
+
+# 2. DEFINE O CLIENTE DO FIRESTORE (NO ESCOPO PRINCIPAL)
+#    Agora a variável 'db' estará acessível em todo o seu código.
+db = firestore.client()
+
+# 3. CARREGA AS CREDENCIAIS DE E-MAIL (TAMBÉM NO ESCOPO PRINCIPAL)
+try:
+    EMAIL = st.secrets["email_credentials"]["email"]
+    SENHA = st.secrets["email_credentials"]["password"]
+except (KeyError, AttributeError):
+    st.error("Credenciais de e-mail não encontradas no secrets.toml. A função de envio de e-mail será desativada.")
+    EMAIL = None
+    SENHA = None
+
+
+# --- DADOS BÁSICOS ---
+servicos = ["Tradicional", "Social", "Degradê", "Pezim", "Navalhado", "Barba", "Abordagem de visagismo", "Consultoria de visagismo"]
+barbeiros = ["Aluizio", "Lucas Borges"]
+cortes_com_barba = ["Tradicional", "Social", "Degradê", "Navalhado"]
+servicos_visagismo = ["Abordagem de visagismo", "Consultoria de visagismo"]
+horarios_tabela = [f"{h:02d}:{m:02d}" for h in range(8, 20) for m in (0, 30)]
+dias_semana_nomes = ["Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo"]
+
+
+# --- FUNÇÕES DE BACKEND (Adaptadas e Novas) ---
+# VERSÃO CORRETA DA FUNÇÃO
+def enviar_email(assunto, mensagem, email_remetente, senha_remetente):
+    """
+    Envia um e-mail usando as credenciais fornecidas como parâmetros.
+    """
+    if not email_remetente or not senha_remetente:
+        st.warning("Credenciais de e-mail não configuradas para envio.")
+        return
+    try:
+        msg = MIMEText(mensagem)
+        msg['Subject'] = assunto
+        msg['From'] = email_remetente
+        msg['To'] = email_remetente  # Envia para o próprio e-mail como notificação
+
+        with smtplib.SMTP('smtp.gmail.com', 587) as server:
+            server.starttls()
+            # Usa os parâmetros recebidos para fazer o login
+            server.login(email_remetente, senha_remetente)
+            server.sendmail(email_remetente, email_remetente, msg.as_string())
+    except Exception as e:
+        st.error(f"Erro ao enviar e-mail: {e}")
+
+# --- SINCRONIZAÇÃO INCREMENTAL DOS DIAS ---
+# Cada escrita em 'agendamentos' incrementa o contador de versão do dia em
+# 'agendamentos_versoes/{AAAA-MM-DD}' e registra o documento alterado na
+# subcoleção 'alteracoes' (uma entrada por documento, sempre sobrescrita).
+# Assim, quem já tem o dia em cache só precisa ler o contador e, se ele mudou,
+# buscar apenas as alterações posteriores à versão que já conhece.
+# A mesma transação mantém 'agendamentos_resumos/{AAAA-MM-DD}', com o tipo de cada documento
+# do dia em 'horarios' ({'HH:MM_Barbeiro[_BLOQUEADO]': nome interno ou TIPO_AGENDAMENTO}),
+# usado no calendário do mês. Fica fora do documento de versão para que a conferência
+# do contador (e o barramento) continue lendo um documento pequeno.
+NOMES_INTERNOS = ("Fechado", "Almoço", "BLOQUEADO")
+TIPO_AGENDAMENTO = "Agendamento"
+
+@st.cache_resource
+def _cache_dias():
+    """
+    Cache compartilhado por todas as sessões deste processo.
+    Formato de 'dias': {'AAAA-MM-DD': {'versao': int, 'docs': {id_documento: dados}}}
+    Formato de 'regras': {'versao': int, 'regras': {id_regra: dados}} ou None
+    Formato de 'resumos': {'AAAA-MM-DD': {'horarios': {chave: tipo}}} (calendário do mês)
+    Cada entrada guarda também 'validado_em' (time.time() da última conferência da versão).
+    'invalidado_em' guarda, por chave ('AAAA-MM-DD' ou 'regras_fechamento'), a última invalidação recebida.
+    """
+    return {'lock': threading.Lock(), 'dias': {}, 'regras': None, 'resumos': {}, 'invalidado_em': {}}
+
+def _ref_versao_dia(data_para_id):
+    return db.collection('agendamentos_versoes').document(data_para_id)
+
+def _ref_resumo_dia(data_para_id):
+    return db.collection('agendamentos_resumos').document(data_para_id)
+
+# --- INVALIDAÇÃO DE CACHE ENTRE INSTÂNCIAS ---
+# Com mais de um processo do Streamlit, cada instância tem o próprio cache. O barramento
+# avisa todas elas quando um dia (ou as regras) muda; enquanto nenhum aviso chega, a
+# entrada em cache é usada sem nenhuma leitura por até CACHE_IDADE_MAXIMA segundos.
+# Depois disso a versão volta a ser conferida, o que limita o atraso mesmo se um aviso se perder.
+# BARRAMENTO_INVALIDACAO: 'firestore' (padrão), 'local' (um único processo / testes) ou 'nenhum'.
+CACHE_IDADE_MAXIMA = int(os.environ.get("CACHE_IDADE_MAXIMA", "30"))
+BARRAMENTO_NOVA_TENTATIVA = 60  # segundos entre tentativas de subir o barramento após uma falha
+_falha_barramento = {'em': 0.0}
+
+class BarramentoLocal:
+    """ Barramento em memória: só notifica os assinantes do próprio processo. """
+
+    def __init__(self):
+        self._assinantes = []
+        self._lock = threading.Lock()
+
+    def assinar(self, callback):
+        with self._lock:
+            self._assinantes.append(callback)
+
+    def publicar(self, chave):
+        with self._lock:
+            assinantes = list(self._assinantes)
+        for callback in assinantes:
+            callback(chave)
+
+class BarramentoFirestore(BarramentoLocal):
+    """
+    Escuta 'agendamentos_versoes' no Firestore. Toda escrita, feita por qualquer instância,
+    altera o contador do dia, e a notificação chega a todas as instâncias que estão escutando.
+    """
+
+    def __init__(self, cliente):
+        super().__init__()
+        # Só interessam contadores alterados depois que este processo subiu;
+        # assim o snapshot inicial vem vazio em vez de trazer todos os dias já gravados.
+        inicio = datetime.now(timezone.utc)
+        consulta = cliente.collection('agendamentos_versoes').where(filter=FieldFilter('updated_at', '>=', inicio))
+        self._watch = consulta.on_snapshot(self._ao_receber_snapshot)
+
+    def _ao_receber_snapshot(self, snapshots, mudancas, read_time):
+        for mudanca in mudancas:
+            BarramentoLocal.publicar(self, mudanca.document.id)
+
+def _invalidar_cache(chave):
+    cache = _cache_dias()
+    with cache['lock']:
+        cache['invalidado_em'][chave] = time.time()
+
+@st.cache_resource
+def _criar_barramento(tipo):
+    """
+    Cria o barramento e inscreve o cache deste processo nele.
+    Se a criação falhar a exceção sobe, e o cache_resource não guarda a falha.
+    """
+    barramento = BarramentoLocal() if tipo == "local" else BarramentoFirestore(db)
+    barramento.assinar(_invalidar_cache)
+    return barramento
+
+def obter_barramento():
+    """
+    Retorna o barramento configurado, ou None se estiver desativado ou indisponível.
+    Após uma falha, nova tentativa só depois de BARRAMENTO_NOVA_TENTATIVA segundos.
+    """
+    tipo = os.environ.get("BARRAMENTO_INVALIDACAO", "firestore")
+    if tipo == "nenhum":
+        return None
+    if time.time() - _falha_barramento['em'] < BARRAMENTO_NOVA_TENTATIVA:
+        return None
+    try:
+        return _criar_barramento(tipo)
+    except Exception as e:
+        # Sem barramento o cache continua correto: a versão é conferida a cada leitura
+        _falha_barramento['em'] = time.time()
+        print(f"Aviso: Não foi possível iniciar o barramento de invalidação "
+              f"(nova tentativa em {BARRAMENTO_NOVA_TENTATIVA}s). {e}")
+        return None
+
+def publicar_invalidacao(chave):
+    barramento = obter_barramento()
+    if barramento:
+        barramento.publicar(chave)
+    else:
+        _invalidar_cache(chave)
+
+def _entrada_em_dia(cache, chave, entrada):
+    """ Indica se a entrada pode ser usada sem conferir a versão no Firestore. """
+    return (entrada is not None
+            and obter_barramento() is not None
+            and entrada['validado_em'] > cache['invalidado_em'].get(chave, 0)
+            and time.time() - entrada['validado_em'] < CACHE_IDADE_MAXIMA)
+
+class HorarioIndisponivel(Exception):
+    """ Levantada por gravar_alteracoes(somente_criar=True) quando o horário já tem documento. """
+
+def _id_do_outro_documento_do_horario(doc_id):
+    """ Cada horário pode ter o ID padrão ou o ID com sufixo _BLOQUEADO. """
+    return doc_id[:-len("_BLOQUEADO")] if doc_id.endswith("_BLOQUEADO") else f"{doc_id}_BLOQUEADO"
+
+def _tipo_do_documento(dados):
+    nome = dados.get('nome')
+    return nome if nome in NOMES_INTERNOS else TIPO_AGENDAMENTO
+
+def _resumo_dos_documentos(data_para_id, docs):
+    """ Converte {id_documento: dados} do dia no resumo {'HH:MM_Barbeiro[_BLOQUEADO]': tipo}. """
+    return {doc_id[len(data_para_id) + 1:]: _tipo_do_documento(dados) for doc_id, dados in docs.items()}
+
+def _resumir_dia(transaction, data_para_id):
+    """ Monta o resumo lendo os documentos do dia (só para dias que ainda não têm resumo). """
+    consulta = db.collection('agendamentos') \
+                 .order_by(FieldPath.document_id()) \
+                 .start_at([data_para_id]) \
+                 .end_at([data_para_id + '\uf8ff'])
+    return _resumo_dos_documentos(data_para_id, {doc.id: doc.to_dict() for doc in transaction.get(consulta)})
+
+@firestore.transactional
+def _inicializar_resumo_transacao(transaction, data_para_id):
+    """ Cria o resumo do dia a partir dos documentos, se ainda não existir. Retorna True se criou. """
+    resumo_ref = _ref_resumo_dia(data_para_id)
+    if resumo_ref.get(transaction=transaction).exists:
+        return False
+    transaction.set(resumo_ref, {'horarios': _resumir_dia(transaction, data_para_id)})
+    return True
+
+@firestore.transactional
+def _gravar_alteracoes_transacao(transaction, data_para_id, alteracoes, somente_criar=False):
+    versao_ref = _ref_versao_dia(data_para_id)
+    snapshot = versao_ref.get(transaction=transaction)
+    dados_versao = (snapshot.to_dict() or {}) if snapshot.exists else {}
+    versao_atual = dados_versao.get('versao', 0)
+    nova_versao = versao_atual + 1
+    resumo_ref = _ref_resumo_dia(data_para_id)
+    resumo_snapshot = resumo_ref.get(transaction=transaction)
+    # Dia ainda sem resumo (gravado antes dele existir): montado uma vez, junto com esta gravação
+    resumo = dict(resumo_snapshot.get('horarios')) if resumo_snapshot.exists else _resumir_dia(transaction, data_para_id)
+
+    if somente_criar:
+        # Leituras dentro da transação: se outra gravação ocupar o horário ao mesmo tempo,
+        # o Firestore repete a transação e a checagem passa a encontrar o documento.
+        for doc_id in alteracoes:
+            for id_horario in (doc_id, _id_do_outro_documento_do_horario(doc_id)):
+                if db.collection('agendamentos').document(id_horario).get(transaction=transaction).exists:
+                    raise HorarioIndisponivel(id_horario)
+
+    for doc_id, dados in alteracoes.items():
+        doc_ref = db.collection('agendamentos').document(doc_id)
+        chave_resumo = doc_id[len(data_para_id) + 1:]
+        if dados is None:
+            transaction.delete(doc_ref)
+            resumo.pop(chave_resumo, None)
+        else:
+            transaction.set(doc_ref, {**dados, 'updated_at': firestore.SERVER_TIMESTAMP})
+            resumo[chave_resumo] = _tipo_do_documento(dados)
+        transaction.set(versao_ref.collection('alteracoes').document(doc_id), {
+            'versao': nova_versao,
+            'excluido': dados is None,
+            'dados': dados,
+            'updated_at': firestore.SERVER_TIMESTAMP
+        })
+
+    transaction.set(resumo_ref, {'horarios': resumo})
+    transaction.set(versao_ref, {'versao': nova_versao, 'updated_at': firestore.SERVER_TIMESTAMP})
+    return nova_versao
+
+def gravar_alteracoes(data_obj, alteracoes, somente_criar=False):
+    """
+    Aplica as alterações de um dia em uma única transação e atualiza o log de versões.
+    'alteracoes' é um dicionário {id_documento: dados}; dados=None significa exclusão.
+    Com somente_criar=True nada é gravado se algum dos horários já estiver ocupado
+    (levanta HorarioIndisponivel).
+    """
+    data_para_id = data_obj.strftime('%Y-%m-%d')
+    nova_versao = _gravar_alteracoes_transacao(db.transaction(), data_para_id, alteracoes, somente_criar)
+    publicar_invalidacao(data_para_id)
+    return nova_versao
+
+def buscar_agendamentos_do_dia(data_obj):
+    """
+    Retorna um dicionário com todos os agendamentos do dia.
+    A chave é o ID do documento, e o valor são os dados do agendamento.
+    """
+    return buscar_dia_com_versao(data_obj)[1]
+
+def buscar_dia_com_versao(data_obj):
+    """
+    Retorna (versao, agendamentos) do dia. A versão é None se a leitura falhar.
+
+    Se o dia já estiver em cache, lê apenas o contador de versão e, se houver
+    mudanças, busca somente as alterações posteriores à versão em cache.
+    Com o barramento de invalidação ativo, um dia conferido há pouco e sem
+    avisos de mudança é devolvido sem nenhuma leitura.
+    """
+    if not db:
+        st.error("Firestore não inicializado.")
+        return None, {}
+    
+    prefixo_id = data_obj.strftime('%Y-%m-%d')
+    cache = _cache_dias()
+    with cache['lock']:
+        entrada = cache['dias'].get(prefixo_id)
+    if _entrada_em_dia(cache, prefixo_id, entrada):
+        return entrada['versao'], dict(entrada['docs'])
+
+    # Marcado antes da leitura da versão: um aviso que chegue durante a carga invalida o resultado
+    validado_em = time.time()
+    try:
+        # A versão é lida ANTES dos documentos: se alguém escrever no meio da
+        # carga, a alteração será reaplicada na próxima sincronização (é idempotente).
+        versao_ref = _ref_versao_dia(prefixo_id)
+        versao_snapshot = versao_ref.get()
+        versao_atual = versao_snapshot.get('versao') if versao_snapshot.exists else 0
+
+        if entrada and entrada['versao'] == versao_atual:
+            with cache['lock']:
+                entrada['validado_em'] = validado_em
+            return versao_atual, dict(entrada['docs'])
+
+        if entrada and entrada['versao'] < versao_atual:
+            # Sincronização incremental: só o que mudou desde a versão em cache
+            ocupados_map = dict(entrada['docs'])
+            alteracoes = versao_ref.collection('alteracoes') \
+                                   .where(filter=FieldFilter('versao', '>', entrada['versao'])) \
+                                   .stream()
+            for alteracao in alteracoes:
+                dados_alteracao = alteracao.to_dict()
+                if dados_alteracao.get('excluido'):
+                    ocupados_map.pop(alteracao.id, None)
+                else:
+                    ocupados_map[alteracao.id] = dados_alteracao.get('dados') or {}
+        else:
+            # Primeira carga do dia (ou contador reiniciado): busca completa
+            ocupados_map = {}
+            docs = db.collection('agendamentos') \
+                     .order_by(FieldPath.document_id()) \
+                     .start_at([prefixo_id]) \
+                     .end_at([prefixo_id + '\uf8ff']) \
+                     .stream()
+            for doc in docs:
+                ocupados_map[doc.id] = doc.to_dict()
+
+        with cache['lock']:
+            cache['dias'][prefixo_id] = {'versao': versao_atual, 'docs': ocupados_map, 'validado_em': validado_em}
+        return versao_atual, dict(ocupados_map)
+    except Exception as e:
+        st.error(f"Erro ao buscar agendamentos do dia: {e}")
+        return None, {}
+
+# FUNÇÕES DE ESCRITA (JÁ CORRIGIDAS NA NOSSA CONVERSA)
+def reservar_agendamento(data_obj, horario, nome, telefone, servicos, barbeiro):
+    """
+    Cria o agendamento e, para Corte+Barba, o bloqueio do horário seguinte, na mesma
+    transação e sem sobrescrever nada. Levanta HorarioIndisponivel se algum dos
+    horários já estiver ocupado ou se o horário seguinte não existir na grade.
+    """
+    data_para_id = data_obj.strftime('%Y-%m-%d')
+    data_para_salvar = datetime.combine(data_obj, datetime.min.time())
+    alteracoes = {f"{data_para_id}_{horario}_{barbeiro}": {
+        'nome': nome, 'telefone': telefone, 'servicos': servicos,
+        'barbeiro': barbeiro, 'data': data_para_salvar, 'horario': horario
+    }}
+    if ocupa_horario_seguinte(servicos):
+        horario_seguinte_str = (datetime.strptime(horario, '%H:%M') + timedelta(minutes=30)).strftime('%H:%M')
+        if horario_seguinte_str not in horarios_tabela:
+            raise HorarioIndisponivel(horario_seguinte_str)
+        alteracoes[f"{data_para_id}_{horario_seguinte_str}_{barbeiro}_BLOQUEADO"] = {
+            'nome': "BLOQUEADO", 'telefone': "INTERNO", 'servicos': [],
+            'barbeiro': barbeiro, 'data': data_para_salvar, 'horario': horario_seguinte_str
+        }
+    return gravar_alteracoes(data_obj, alteracoes, somente_criar=True)
+
+def bloquear_horario(data_obj, horario, barbeiro, motivo="BLOQUEADO"):
+    if not db: return False
+    data_para_id = data_obj.strftime('%Y-%m-%d')
+    chave_bloqueio = f"{data_para_id}_{horario}_{barbeiro}_BLOQUEADO" if motivo == "BLOQUEADO" else f"{data_para_id}_{horario}_{barbeiro}"
+    try:
+        # CORREÇÃO: Converte o objeto 'date' para 'datetime' antes de salvar
+        data_para_salvar = datetime.combine(data_obj, datetime.min.time())
+        gravar_alteracoes(data_obj, {chave_bloqueio: {
+            'nome': motivo, 'telefone': "INTERNO", 'servicos': [], 
+            'barbeiro': barbeiro, 'data': data_para_salvar, 'horario': horario
+        }})
+        return True
+    except Exception as e:
+        st.error(f"Erro ao bloquear horário: {e}")
+        return False
+        
+# ADICIONE ESTA FUNÇÃO JUNTO COM AS OUTRAS FUNÇÕES DE BACKEND
+
+def desbloquear_horario(data_obj, horario_agendado, barbeiro):
+    """
+    Remove o documento de bloqueio (_BLOQUEADO) referente a um agendamento de Corte+Barba.
+    """
+    if not db: return
+    try:
+        # Calcula o horário seguinte que foi bloqueado
+        horario_dt = datetime.strptime(horario_agendado, '%H:%M') + timedelta(minutes=30)
+        horario_seguinte_str = horario_dt.strftime('%H:%M')
+        
+        # Cria o ID do documento de bloqueio no formato correto
+        data_para_id = data_obj.strftime('%Y-%m-%d')
+        chave_bloqueio = f"{data_para_id}_{horario_seguinte_str}_{barbeiro}_BLOQUEADO"
+        
+        # Deleta o documento
+        bloqueio_ref = db.collection('agendamentos').document(chave_bloqueio)
+        if bloqueio_ref.get().exists:
+            gravar_alteracoes(data_obj, {chave_bloqueio: None})
+    except Exception as e:
+        # Apenas avisa no console, não precisa mostrar erro para o usuário
+        print(f"Aviso: Não foi possível desbloquear o horário seguinte. {e}")
+
+def verificar_disponibilidade_especifica(data_obj, horario, barbeiro):
+    """ Verifica de forma eficiente se um único horário está livre. """
+    if not db: return False
+    data_para_id = data_obj.strftime('%Y-%m-%d')
+    id_padrao = f"{data_para_id}_{horario}_{barbeiro}"
+    id_bloqueado = f"{data_para_id}_{horario}_{barbeiro}_BLOQUEADO"
+    try:
+        doc_padrao_ref = db.collection('agendamentos').document(id_padrao)
+        doc_bloqueado_ref = db.collection('agendamentos').document(id_bloqueado)
+        
+        # Se qualquer um dos dois documentos existir, o horário não está livre.
+        if doc_padrao_ref.get().exists or doc_bloqueado_ref.get().exists:
+            return False # Indisponível
+        # Um fechamento recorrente também ocupa o horário
+        regras = carregar_regras_fechamento()
+        if any(regra_fecha_horario(regra, data_obj, horario, barbeiro) for regra in regras.values()):
+            return False
+        return True # Disponível
+    except Exception:
+        return False
+
+def cancelar_agendamento(data_obj, horario, barbeiro):
+    if not db: return None
+    data_para_id = data_obj.strftime('%Y-%m-%d')
+    chave_agendamento = f"{data_para_id}_{horario}_{barbeiro}"
+    agendamento_ref = db.collection('agendamentos').document(chave_agendamento)
+    try:
+        doc = agendamento_ref.get()
+        if doc.exists:
+            agendamento_data = doc.to_dict()
+            gravar_alteracoes(data_obj, {chave_agendamento: None})
+            return agendamento_data
+        return None
+    except Exception as e:
+        st.error(f"Erro ao cancelar agendamento: {e}")
+        return None
+
+def fechar_horario(data_obj, horario, barbeiro):
+    return fechar_horarios(data_obj, [horario], barbeiro)
+
+def fechar_horarios(data_obj, horarios, barbeiro):
+    """ Fecha vários horários do dia de uma vez (uma única transação e uma única versão). """
+    if not db: return False
+    data_para_id = data_obj.strftime('%Y-%m-%d')
+    try:
+        # CORREÇÃO: Converte o objeto 'date' para 'datetime' antes de salvar
+        data_para_salvar = datetime.combine(data_obj, datetime.min.time())
+        gravar_alteracoes(data_obj, {
+            f"{data_para_id}_{horario}_{barbeiro}": {
+                'nome': "Fechado", 'telefone': "INTERNO", 'servicos': [],
+                'barbeiro': barbeiro, 'data': data_para_salvar, 'horario': horario
+            }
+            for horario in horarios
+        })
+        return True
+    except Exception as e:
+        st.error(f"Erro ao fechar horário: {e}")
+        return False
+    # ADICIONE ESTA NOVA FUNÇÃO NO SEU BLOCO DE FUNÇÕES DE BACKEND
+
+# NO SEU ARQUIVO agn.py, SUBSTITUA ESTA FUNÇÃO:
+
+def desbloquear_horario_especifico(data_obj, horario, barbeiro):
+    return desbloquear_horarios(data_obj, [horario], barbeiro)
+
+def desbloquear_horarios(data_obj, horarios, barbeiro):
+    """
+    Remove agendamentos/bloqueios dos horários informados, tentando apagar tanto o ID
+    padrão quanto o ID com sufixo _BLOQUEADO para garantir a limpeza.
+    Todo o intervalo é gravado em uma única transação.
+    """
+    if not db: return False
+    
+    data_para_id = data_obj.strftime('%Y-%m-%d')
+    
+    # Define os dois possíveis nomes de documento que podem estar ocupando cada horário
+    alteracoes = {}
+    for horario in horarios:
+        alteracoes[f"{data_para_id}_{horario}_{barbeiro}"] = None
+        alteracoes[f"{data_para_id}_{horario}_{barbeiro}_BLOQUEADO"] = None
+    
+    try:
+        # Tenta apagar os documentos. O Firestore não gera erro se o documento não existir.
+        # Isso garante que tanto um agendamento normal quanto um bloqueio órfão sejam removidos.
+        gravar_alteracoes(data_obj, alteracoes)
+        
+        return True # Retorna sucesso, pois a intenção é deixar o horário livre.
+        
+    except Exception as e:
+        st.error(f"Erro ao tentar desbloquear horário: {e}")
+        return False
+
+# --- REGRAS DE FECHAMENTO RECORRENTES ---
+# Em vez de gravar um documento 'Fechado' por horário e por dia, cada regra guarda
+# o barbeiro, o intervalo de horários, a vigência (data inicial e final opcional),
+# os dias da semana (lista vazia = todos) e as datas de exceção ('AAAA-MM-DD').
+# As regras são aplicadas na leitura; documentos explícitos do horário têm prioridade.
+
+def _ref_versao_regras():
+    return db.collection('agendamentos_versoes').document('regras_fechamento')
+
+CAMPOS_OBRIGATORIOS_REGRA = ('barbeiro', 'horario_inicio', 'horario_fim', 'data_inicio')
+
+def _gravar_regra(regra_id, dados, atualizar=False):
+    """
+    Grava (ou exclui, se dados=None) uma regra e incrementa a versão das regras.
+    Com atualizar=True usa update(), que falha se a regra já tiver sido excluída
+    (em vez de recriá-la só com os campos alterados).
+    """
+    batch = db.batch()
+    regra_ref = db.collection('regras_fechamento').document(regra_id)
+    if dados is None:
+        batch.delete(regra_ref)
+    elif atualizar:
+        batch.update(regra_ref, {**dados, 'updated_at': firestore.SERVER_TIMESTAMP})
+    else:
+        batch.set(regra_ref, {**dados, 'updated_at': firestore.SERVER_TIMESTAMP})
+    batch.set(_ref_versao_regras(), {
+        'versao': firestore.Increment(1), 'updated_at': firestore.SERVER_TIMESTAMP
+    }, merge=True)
+    batch.commit()
+    publicar_invalidacao('regras_fechamento')
+
+def carregar_regras_fechamento():
+    """ Retorna {id_regra: dados} com todas as regras de fechamento. """
+    return carregar_regras_com_versao()[1]
+
+def carregar_regras_com_versao():
+    """
+    Retorna (versao, regras). Usa o cache do processo enquanto a versão das
+    regras não mudar (uma única leitura pequena, ou nenhuma se o barramento
+    de invalidação estiver ativo). A versão é None se a leitura falhar.
+    """
+    if not db: return None, {}
+    cache = _cache_dias()
+    with cache['lock']:
+        entrada = cache['regras']
+    if _entrada_em_dia(cache, 'regras_fechamento', entrada):
+        return entrada['versao'], entrada['regras']
+
+    validado_em = time.time()
+    try:
+        versao_snapshot = _ref_versao_regras().get()
+        versao_atual = versao_snapshot.get('versao') if versao_snapshot.exists else 0
+
+        if entrada and entrada['versao'] == versao_atual:
+            with cache['lock']:
+                entrada['validado_em'] = validado_em
+            return versao_atual, entrada['regras']
+
+        regras = {}
+        for doc in db.collection('regras_fechamento').stream():
+            regra = doc.to_dict()
+            # Ignora documentos incompletos para não quebrar a grade
+            if all(regra.get(campo) for campo in CAMPOS_OBRIGATORIOS_REGRA):
+                regras[doc.id] = regra
+        with cache['lock']:
+            cache['regras'] = {'versao': versao_atual, 'regras': regras, 'validado_em': validado_em}
+        return versao_atual, regras
+    except Exception as e:
+        st.error(f"Erro ao carregar regras de fechamento: {e}")
+        return None, {}
+
+def criar_regra_fechamento(barbeiro, horario_inicio, horario_fim, data_inicio, data_fim=None, dias_semana=None):
+    if not db: return False
+    try:
+        regra_id = db.collection('regras_fechamento').document().id
+        _gravar_regra(regra_id, {
+            'barbeiro': barbeiro,
+            'horario_inicio': horario_inicio,
+            'horario_fim': horario_fim,
+            'data_inicio': data_inicio.strftime('%Y-%m-%d'),
+            'data_fim': data_fim.strftime('%Y-%m-%d') if data_fim else None,
+            'dias_semana': sorted(dias_semana or []),
+            'excecoes': []
+        })
+        return True
+    except Exception as e:
+        st.error(f"Erro ao criar regra de fechamento: {e}")
+        return False
+
+def excluir_regra_fechamento(regra_id):
+    if not db: return False
+    try:
+        _gravar_regra(regra_id, None)
+        return True
+    except Exception as e:
+        st.error(f"Erro ao excluir regra de fechamento: {e}")
+        return False
+
+def adicionar_excecao_regra(regra_id, data_obj):
+    """ Libera uma data específica de uma regra, sem alterar as demais datas. """
+    if not db: return False
+    try:
+        _gravar_regra(regra_id, {'excecoes': firestore.ArrayUnion([data_obj.strftime('%Y-%m-%d')])}, atualizar=True)
+        return True
+    except NotFound:
+        st.error("Esta regra já foi excluída. Atualize a página.")
+        return False
+    except Exception as e:
+        st.error(f"Erro ao liberar data da regra: {e}")
+        return False
+
+def regra_se_aplica(regra, data_obj):
+    """ Verifica se a regra vale para a data (vigência, dia da semana e exceções). """
+    data_para_id = data_obj.strftime('%Y-%m-%d')
+    if data_para_id in regra.get('excecoes', []):
+        return False
+    if regra.get('data_inicio') and data_para_id < regra['data_inicio']:
+        return False
+    if regra.get('data_fim') and data_para_id > regra['data_fim']:
+        return False
+    dias_semana = regra.get('dias_semana')
+    return not dias_semana or data_obj.weekday() in dias_semana
+
+def regra_fecha_horario(regra, data_obj, horario, barbeiro):
+    return (regra.get('barbeiro') == barbeiro
+            and regra['horario_inicio'] <= horario <= regra['horario_fim']
+            and regra_se_aplica(regra, data_obj))
+
+def aplicar_regras_fechamento(data_obj, ocupados_map, regras):
+    """
+    Sobrepõe as regras de fechamento aos documentos do dia e retorna um novo dicionário.
+    Horários que já têm documento (agendamento, bloqueio ou fechamento) são mantidos como estão.
+    """
+    data_para_id = data_obj.strftime('%Y-%m-%d')
+    resultado = dict(ocupados_map)
+    for regra_id, regra in regras.items():
+        if not regra_se_aplica(regra, data_obj):
+            continue
+        for horario in horarios_tabela:
+            if not regra['horario_inicio'] <= horario <= regra['horario_fim']:
+                continue
+            id_padrao = f"{data_para_id}_{horario}_{regra['barbeiro']}"
+            id_bloqueado = f"{id_padrao}_BLOQUEADO"
+            if id_padrao in resultado or id_bloqueado in resultado:
+                continue
+            resultado[id_padrao] = {
+                'nome': "Fechado", 'telefone': "INTERNO", 'servicos': [],
+                'barbeiro': regra['barbeiro'], 'horario': horario, 'regra_id': regra_id
+            }
+    return resultado
+
+def descrever_regra(regra):
+    dias = ", ".join(dias_semana_nomes[d] for d in regra.get('dias_semana', [])) or "Todos os dias"
+    inicio = datetime.strptime(regra['data_inicio'], '%Y-%m-%d').strftime('%d/%m/%Y')
+    fim = datetime.strptime(regra['data_fim'], '%Y-%m-%d').strftime('%d/%m/%Y') if regra.get('data_fim') else "sem data final"
+    return f"{regra['barbeiro']}: {regra['horario_inicio']}–{regra['horario_fim']} | {dias} | de {inicio} até {fim}"
+
+# --- STATUS DOS HORÁRIOS ---
+
+def ocupa_horario_seguinte(servicos_selecionados):
+    """ Corte + Barba ocupa também o horário seguinte (bloqueado com _BLOQUEADO). """
+    return "Barba" in servicos_selecionados and any(c in servicos_selecionados for c in cortes_com_barba)
+
+def calcular_status_horario(data_obj, horario, barbeiro, ocupados_map):
+    """
+    Calcula o status de um horário a partir dos documentos do dia (já com as regras
+    de fechamento aplicadas) e das regras fixas da barbearia.
+    Retorna (status, texto_botao, dados_agendamento, is_clicavel).
+    """
+    data_para_id = data_obj.strftime('%Y-%m-%d')
+    status = "disponivel"
+    texto_botao = "Disponível"
+    dados_agendamento = {}
+    is_clicavel = True
+
+    # --- LÓGICA SDJ ADICIONADA AQUI ---
+    dia_mes = data_obj.day
+    mes_ano = data_obj.month
+    dia_semana = data_obj.weekday() # 0=Segunda, 6=Domingo
+    is_intervalo_especial = (mes_ano == 7 and 10 <= dia_mes <= 19)
+
+    hora_int = int(horario.split(':')[0])
+
+    # REGRA 0: DURANTE O INTERVALO ESPECIAL, QUASE TUDO É LIBERADO
+    if is_intervalo_especial:
+        # Durante o intervalo, a única regra é verificar agendamentos no banco
+        id_padrao = f"{data_para_id}_{horario}_{barbeiro}"
+        id_bloqueado = f"{data_para_id}_{horario}_{barbeiro}_BLOQUEADO"
+        if id_padrao in ocupados_map:
+            dados_agendamento = ocupados_map[id_padrao]
+            nome = dados_agendamento.get("nome", "Ocupado")
+            status, texto_botao = ("fechado" if nome == "Fechado" else "ocupado"), nome
+        elif id_bloqueado in ocupados_map:
+            status, texto_botao, dados_agendamento = "ocupado", "Bloqueado", {"nome": "BLOQUEADO"}
+
+    # REGRAS PARA DIAS NORMAIS (FORA DO INTERVALO ESPECIAL)
+    else:
+        # REGRA 1: Horários das 7h (SDJ)
+        id_padrao = f"{data_para_id}_{horario}_{barbeiro}"
+        id_bloqueado = f"{data_para_id}_{horario}_{barbeiro}_BLOQUEADO"
+
+        if id_padrao in ocupados_map:
+            dados_agendamento = ocupados_map[id_padrao]
+            nome = dados_agendamento.get("nome", "Ocupado")
+            # A verificação de "Fechado" agora acontece ANTES da regra de almoço.
+            if nome == "Fechado":
+                status, texto_botao, is_clicavel = "fechado", "Fechado", False
+            elif nome == "Almoço": # Mantém a possibilidade de fechar como almoço em dias especiais
+                status, texto_botao, is_clicavel = "almoco", "Almoço", False
+            else: # Se for qualquer outro nome, é um agendamento normal
+                status, texto_botao = "ocupado", nome
+
+        elif id_bloqueado in ocupados_map:
+            status, texto_botao, dados_agendamento = "ocupado", "Bloqueado", {"nome": "BLOQUEADO"}
+
+        # 2. SE NÃO HOUVER NADA NO BANCO para este horário, aplicamos as regras fixas do sistema.
+        elif horario in ["07:00", "07:30"]:
+            status, texto_botao, is_clicavel = "indisponivel", "SDJ", False
+
+        elif horario == "08:00" and barbeiro == "Lucas Borges":
+            status, texto_botao, is_clicavel = "indisponivel", "Indisponível", False
+
+        elif dia_semana == 6: # Domingo
+            status, texto_botao, is_clicavel = "fechado", "Fechado", False
+
+        elif dia_semana < 5 and hora_int in [12, 13]: # Almoço
+             status, texto_botao, is_clicavel = "almoco", "Almoço", False
+
+    return status, texto_botao, dados_agendamento, is_clicavel
+
+# --- OCUPAÇÃO DO MÊS ---
+# O calendário do mês lê só os resumos 'agendamentos_resumos/{dia}' (um get_all do mês),
+# mantidos pela mesma transação que grava as alterações. Com o resumo, ocupados e livres
+# saem da mesma sobreposição de regras e do mesmo cálculo de status usados na grade.
+# Os resumos ficam no cache do processo: dias passados não expiram, hoje e os dias futuros
+# seguem as mesmas regras das entradas de 'dias' (barramento e CACHE_IDADE_MAXIMA).
+# Dia sem resumo é dia sem documentos; os dias gravados antes dos resumos existirem são
+# preenchidos uma única vez com:  python -c "import backend; backend.migrar_resumos_dos_dias()"
+
+def ocupacao_do_dia(data_obj, resumo, regras):
+    """ Retorna {barbeiro: (agendados, livres)} a partir do resumo do dia. """
+    data_para_id = data_obj.strftime('%Y-%m-%d')
+    ocupados_map = {f"{data_para_id}_{chave}": {'nome': tipo} for chave, tipo in resumo.items()}
+    mapa = aplicar_regras_fechamento(data_obj, ocupados_map, regras)
+    ocupacao = {}
+    for barbeiro in barbeiros:
+        agendados = sum(1 for chave, tipo in resumo.items()
+                        if tipo == TIPO_AGENDAMENTO and chave.split('_')[1] == barbeiro)
+        livres = sum(1 for horario in horarios_tabela
+                     if calcular_status_horario(data_obj, horario, barbeiro, mapa)[0] == "disponivel")
+        ocupacao[barbeiro] = (agendados, livres)
+    return ocupacao
+
+def _resumo_em_dia(cache, data_obj, entrada):
+    """ Como _entrada_em_dia, mas dias passados só deixam de valer com uma invalidação do próprio dia. """
+    chave = data_obj.strftime('%Y-%m-%d')
+    if entrada is not None and data_obj < date.today():
+        return entrada['validado_em'] > cache['invalidado_em'].get(chave, 0)
+    return _entrada_em_dia(cache, chave, entrada)
+
+def _resumos_do_mes(datas):
+    """ Retorna {'AAAA-MM-DD': resumo}, lendo do Firestore só os dias que não estão em dia no cache. """
+    cache = _cache_dias()
+    resumos, faltando = {}, []
+    for data_obj in datas:
+        data_para_id = data_obj.strftime('%Y-%m-%d')
+        with cache['lock']:
+            entrada_resumo = cache['resumos'].get(data_para_id)
+            entrada_dia = cache['dias'].get(data_para_id)
+        if _resumo_em_dia(cache, data_obj, entrada_resumo):
+            resumos[data_para_id] = entrada_resumo['horarios']
+        elif _resumo_em_dia(cache, data_obj, entrada_dia):
+            # O dia já carregado pela grade serve de resumo sem nenhuma leitura
+            resumos[data_para_id] = _resumo_dos_documentos(data_para_id, entrada_dia['docs'])
+        else:
+            faltando.append(data_para_id)
+
+    if faltando:
+        validado_em = time.time()
+        lidos = {snap.id: (snap.to_dict() or {}).get('horarios', {}) if snap.exists else {}
+                 for snap in db.get_all([_ref_resumo_dia(data_para_id) for data_para_id in faltando])}
+        with cache['lock']:
+            for data_para_id in faltando:
+                resumos[data_para_id] = lidos.get(data_para_id, {})
+                cache['resumos'][data_para_id] = {'horarios': resumos[data_para_id], 'validado_em': validado_em}
+    return resumos
+
+def ocupacao_do_mes(ano, mes):
+    """
+    Retorna {date: {barbeiro: (agendados, livres)}} para todos os dias do mês.
+    'agendados' conta só agendamentos de clientes; fechamentos, almoço e bloqueios
+    apenas deixam de contar como livres.
+    """
+    if not db: return {}
+    regras = carregar_regras_fechamento()
+    datas = [date(ano, mes, dia) for dia in range(1, calendar.monthrange(ano, mes)[1] + 1)]
+    try:
+        resumos = _resumos_do_mes(datas)
+    except Exception as e:
+        st.error(f"Erro ao calcular a ocupação do mês: {e}")
+        return {}
+    return {data_obj: ocupacao_do_dia(data_obj, resumos[data_obj.strftime('%Y-%m-%d')], regras) for data_obj in datas}
+
+def migrar_resumos_dos_dias():
+    """
+    Migração única: cria o resumo dos dias que já têm documentos em 'agendamentos'
+    mas foram gravados antes dos resumos existirem. Dias sem documentos não são gravados.
+    Rodar antes de publicar esta versão (instâncias já no ar guardam dias passados sem expirar).
+    Retorna quantos resumos foram criados.
+    """
+    dias = sorted({doc.id[:10] for doc in db.collection('agendamentos').select([]).stream()})
+    criados = sum(1 for data_para_id in dias if _inicializar_resumo_transacao(db.transaction(), data_para_id))
+    print(f"Resumos criados: {criados} de {len(dias)} dias com agendamentos.")
+    return criados
@@ -0,0 +1,224 @@
+"""
+Dublês em memória do Streamlit e do Firestore, para testar backend.py sem credenciais.
+"""
+import functools
+import os
+import sys
+import types
+import uuid
+from unittest import mock
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# --- DUBLÊS DO FIRESTORE ---
+
+class Snapshot:
+    def __init__(self, doc_id, dados):
+        self.id = doc_id
+        self._dados = dados
+        self.exists = dados is not None
+
+    def get(self, campo):
+        return self._dados[campo]
+
+    def to_dict(self):
+        return dict(self._dados)
+
+
+class Consulta:
+    def __init__(self, banco, caminho, filtros=(), inicio=None, fim=None):
+        self.banco, self.caminho, self.filtros = banco, caminho, list(filtros)
+        self.inicio, self.fim = inicio, fim
+
+    def order_by(self, *args, **kwargs):
+        return self
+
+    def select(self, campos):
+        return self
+
+    def start_at(self, valores):
+        return Consulta(self.banco, self.caminho, self.filtros, valores[0], self.fim)
+
+    def end_at(self, valores):
+        return Consulta(self.banco, self.caminho, self.filtros, self.inicio, valores[0])
+
+    def where(self, filter):
+        return Consulta(self.banco, self.caminho, self.filtros + [filter], self.inicio, self.fim)
+
+    def stream(self):
+        self.banco.leituras += 1
+        for doc_id, dados in sorted(self.banco.colecao(self.caminho).items()):
+            if self.inicio is not None and not self.inicio <= doc_id <= self.fim:
+                continue
+            if all(f.aceita(dados) for f in self.filtros):
+                yield Snapshot(doc_id, dados)
+
+
+class Colecao(Consulta):
+    def document(self, doc_id=None):
+        return Documento(self.banco, self.caminho, doc_id or uuid.uuid4().hex)
+
+
+class Documento:
+    def __init__(self, banco, caminho, doc_id):
+        self.banco, self.caminho, self.id = banco, caminho, doc_id
+
+    def get(self, transaction=None):
+        self.banco.leituras += 1
+        return Snapshot(self.id, self.banco.colecao(self.caminho).get(self.id))
+
+    def collection(self, nome):
+        return Colecao(self.banco, f"{self.caminho}/{self.id}/{nome}")
+
+
+class BancoFalso:
+    def __init__(self):
+        self.dados = {}
+        self.leituras = 0
+
+    def colecao(self, caminho):
+        return self.dados.setdefault(caminho, {})
+
+    def collection(self, nome):
+        return Colecao(self, nome)
+
+    def transaction(self):
+        return Transacao(self)
+
+    def batch(self):
+        return Lote(self)
+
+    def get_all(self, refs):
+        return [ref.get() for ref in refs]
+
+
+class NotFound(Exception):
+    """ Como google.api_core.exceptions.NotFound. """
+
+
+class Incremento:
+    def __init__(self, valor):
+        self.valor = valor
+
+
+class UniaoDeLista:
+    def __init__(self, valores):
+        self.valores = list(valores)
+
+
+def _aplicar_campos(atual, dados):
+    """ Resolve Increment e ArrayUnion contra os valores já gravados. """
+    resultado = dict(atual)
+    for campo, valor in dados.items():
+        if isinstance(valor, Incremento):
+            valor = resultado.get(campo, 0) + valor.valor
+        elif isinstance(valor, UniaoDeLista):
+            lista = list(resultado.get(campo) or [])
+            valor = lista + [v for v in valor.valores if v not in lista]
+        resultado[campo] = valor
+    return resultado
+
+
+class Transacao:
+    """ Aplica as escritas direto no banco (os testes rodam numa única thread). """
+
+    def __init__(self, banco):
+        self.banco = banco
+
+    def get(self, consulta):
+        return list(consulta.stream())
+
+    def set(self, ref, dados, merge=False):
+        colecao = self.banco.colecao(ref.caminho)
+        colecao[ref.id] = _aplicar_campos(colecao.get(ref.id, {}) if merge else {}, dados)
+
+    def update(self, ref, dados):
+        colecao = self.banco.colecao(ref.caminho)
+        if ref.id not in colecao:
+            raise NotFound(f"{ref.caminho}/{ref.id}")
+        colecao[ref.id] = _aplicar_campos(colecao[ref.id], dados)
+
+    def delete(self, ref):
+        self.banco.colecao(ref.caminho).pop(ref.id, None)
+
+
+class Lote(Transacao):
+    """ Como o WriteBatch: guarda as escritas e aplica todas no commit (nenhuma, se uma falhar). """
+
+    def __init__(self, banco):
+        super().__init__(banco)
+        self._escritas = []
+
+    def set(self, ref, dados, merge=False):
+        self._escritas.append(lambda: Transacao.set(self, ref, dados, merge))
+
+    def update(self, ref, dados):
+        self._escritas.append(lambda: Transacao.update(self, ref, dados))
+
+    def delete(self, ref):
+        self._escritas.append(lambda: Transacao.delete(self, ref))
+
+    def commit(self):
+        copia = {caminho: dict(docs) for caminho, docs in self.banco.dados.items()}
+        try:
+            for escrita in self._escritas:
+                escrita()
+        except Exception:
+            self.banco.dados = copia
+            raise
+
+
+class FiltroCampo:
+    OPERADORES = {'==': lambda a, b: a == b, '>': lambda a, b: a > b, '>=': lambda a, b: a >= b}
+
+    def __init__(self, campo, operador, valor):
+        self.campo, self.operador, self.valor = campo, operador, valor
+
+    def aceita(self, dados):
+        return self.campo in dados and self.OPERADORES[self.operador](dados[self.campo], self.valor)
+
+
+def cache_resource(func):
+    """ Como o st.cache_resource: memoriza por argumentos e não guarda exceções. """
+    resultados = {}
+
+    @functools.wraps(func)
+    def wrapper(*args):
+        if args not in resultados:
+            resultados[args] = func(*args)
+        return resultados[args]
+    wrapper.clear = resultados.clear
+    return wrapper
+
+
+def _modulo(nome, **atributos):
+    modulo = types.ModuleType(nome)
+    modulo.__dict__.update(atributos)
+    return modulo
+
+
+def carregar_backend(banco):
+    """ Importa backend.py com os dublês no lugar do Streamlit e do Firebase. """
+    firestore = _modulo('firebase_admin.firestore', client=lambda: banco, transactional=lambda f: f,
+                        SERVER_TIMESTAMP=object(), Increment=Incremento, ArrayUnion=UniaoDeLista)
+    modulos = {
+        'streamlit': _modulo('streamlit', cache_resource=cache_resource, error=print, warning=print,
+                             info=print, stop=lambda: None,
+                             secrets={'firebase': {}, 'email_credentials': {'email': None, 'password': None}}),
+        'firebase_admin': _modulo('firebase_admin', _apps=[object()], firestore=firestore,
+                                  credentials=_modulo('credentials', Certificate=lambda d: None)),
+        'firebase_admin.firestore': firestore,
+        'google': _modulo('google'),
+        'google.cloud': _modulo('google.cloud'),
+        'google.cloud.firestore_v1': _modulo('google.cloud.firestore_v1'),
+        'google.cloud.firestore_v1.field_path': _modulo(
+            'google.cloud.firestore_v1.field_path', FieldPath=types.SimpleNamespace(document_id=lambda: '__name__')),
+        'google.cloud.firestore_v1.base_query': _modulo('google.cloud.firestore_v1.base_query', FieldFilter=FiltroCampo),
+        'google.api_core': _modulo('google.api_core'),
+        'google.api_core.exceptions': _modulo('google.api_core.exceptions', NotFound=NotFound),
+    }
+    with mock.patch.dict(sys.modules, modulos), mock.patch.object(sys, 'path', [RAIZ] + sys.path):
+        sys.modules.pop('backend', None)
+        import backend
+    return backend
@@ -0,0 +1,86 @@
+"""
+Testes do cache de dias e do barramento de invalidação (backend.py).
+
+O Firebase e o Streamlit são substituídos por dublês em memória (tests/dubles.py),
+então os testes rodam sem credenciais:  python -m unittest discover tests
+"""
+import os
+import unittest
+from datetime import date
+from unittest import mock
+
+from dubles import BancoFalso, carregar_backend
+
+
+# --- TESTES ---
+
+DIA = '2030-03-04'
+
+
+class CacheDosDiasTest(unittest.TestCase):
+
+    def setUp(self):
+        self.banco = BancoFalso()
+        self.backend = carregar_backend(self.banco)
+        self.data_obj = date(2030, 3, 4)
+        self.banco.colecao('agendamentos')[f"{DIA}_09:00_Aluizio"] = {'nome': "Ana", 'barbeiro': "Aluizio"}
+        self.banco.colecao('agendamentos_versoes')[DIA] = {'versao': 1}
+        self.ambiente = mock.patch.dict(os.environ, {'BARRAMENTO_INVALIDACAO': 'local'})
+        self.ambiente.start()
+        self.addCleanup(self.ambiente.stop)
+
+    def simular_escrita_de_outra_instancia(self):
+        """ Outra instância grava a versão 2 do dia (sem passar pelo cache deste processo). """
+        self.banco.colecao('agendamentos_versoes')[DIA] = {'versao': 2}
+        doc_id = f"{DIA}_10:00_Aluizio"
+        self.banco.colecao(f"agendamentos_versoes/{DIA}/alteracoes")[doc_id] = {
+            'versao': 2, 'excluido': False, 'dados': {'nome': "Bia", 'barbeiro': "Aluizio"}
+        }
+        return doc_id
+
+    def test_dia_em_cache_nao_faz_leituras(self):
+        versao, docs = self.backend.buscar_dia_com_versao(self.data_obj)
+        self.assertEqual((versao, len(docs)), (1, 1))
+
+        leituras = self.banco.leituras
+        self.assertEqual(self.backend.buscar_dia_com_versao(self.data_obj), (versao, docs))
+        self.assertEqual(self.banco.leituras, leituras)
+
+    def test_publicar_invalidacao_faz_a_proxima_leitura_buscar_de_novo(self):
+        self.backend.buscar_dia_com_versao(self.data_obj)
+        doc_id = self.simular_escrita_de_outra_instancia()
+
+        # Sem aviso, a entrada ainda é considerada em dia
+        self.assertNotIn(doc_id, self.backend.buscar_agendamentos_do_dia(self.data_obj))
+
+        self.backend.obter_barramento().publicar(DIA)
+        leituras = self.banco.leituras
+        versao, docs = self.backend.buscar_dia_com_versao(self.data_obj)
+        self.assertGreater(self.banco.leituras, leituras)
+        self.assertEqual(versao, 2)
+        self.assertEqual(docs[doc_id]['nome'], "Bia")
+        self.assertIn(f"{DIA}_09:00_Aluizio", docs)
+
+    def test_entrada_expira_depois_da_idade_maxima(self):
+        self.backend.buscar_dia_com_versao(self.data_obj)
+        self.simular_escrita_de_outra_instancia()
+        with mock.patch.object(self.backend, 'CACHE_IDADE_MAXIMA', 0):
+            self.assertEqual(self.backend.buscar_dia_com_versao(self.data_obj)[0], 2)
+
+    def test_falha_do_barramento_nao_fica_em_cache(self):
+        with mock.patch.dict(os.environ, {'BARRAMENTO_INVALIDACAO': 'firestore'}), \
+             mock.patch.object(self.backend, 'BarramentoFirestore', side_effect=RuntimeError("sem rede")), \
+             mock.patch('builtins.print'):
+            self.assertIsNone(self.backend.obter_barramento())
+
+        with mock.patch.dict(os.environ, {'BARRAMENTO_INVALIDACAO': 'firestore'}), \
+             mock.patch.object(self.backend, 'BarramentoFirestore', lambda cliente: self.backend.BarramentoLocal()):
+            # Dentro do intervalo de espera não há nova tentativa...
+            self.assertIsNone(self.backend.obter_barramento())
+            # ...e depois dele o barramento sobe normalmente
+            self.backend._falha_barramento['em'] = 0.0
+            self.assertIsNotNone(self.backend.obter_barramento())
+
+
+if __name__ == '__main__':
+    unittest.main()
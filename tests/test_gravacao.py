@@ -0,0 +1,59 @@
+"""
+Testes das gravações transacionais de agendamentos (backend.py).
+"""
+import os
+import unittest
+from datetime import date
+from unittest import mock
+
+from dubles import BancoFalso, carregar_backend
+
+DIA = '2030-03-04'
+
+
+class ReservarAgendamentoTest(unittest.TestCase):
+
+    def setUp(self):
+        self.banco = BancoFalso()
+        self.backend = carregar_backend(self.banco)
+        self.data_obj = date(2030, 3, 4)
+        self.ambiente = mock.patch.dict(os.environ, {'BARRAMENTO_INVALIDACAO': 'local'})
+        self.ambiente.start()
+        self.addCleanup(self.ambiente.stop)
+
+    def agendamentos(self):
+        return self.banco.colecao('agendamentos')
+
+    def test_segunda_reserva_do_mesmo_horario_nao_sobrescreve(self):
+        self.backend.reservar_agendamento(self.data_obj, "09:00", "Ana", "", ["Social"], "Aluizio")
+        with self.assertRaises(self.backend.HorarioIndisponivel):
+            self.backend.reservar_agendamento(self.data_obj, "09:00", "Bia", "", ["Social"], "Aluizio")
+
+        self.assertEqual(self.agendamentos()[f"{DIA}_09:00_Aluizio"]['nome'], "Ana")
+        self.assertEqual(self.banco.colecao('agendamentos_versoes')[DIA]['versao'], 1)
+
+    def test_corte_e_barba_bloqueia_o_horario_seguinte_na_mesma_gravacao(self):
+        self.backend.reservar_agendamento(self.data_obj, "09:00", "Ana", "", ["Social", "Barba"], "Aluizio")
+
+        self.assertIn(f"{DIA}_09:00_Aluizio", self.agendamentos())
+        self.assertEqual(self.agendamentos()[f"{DIA}_09:30_Aluizio_BLOQUEADO"]['nome'], "BLOQUEADO")
+        self.assertEqual(self.banco.colecao('agendamentos_versoes')[DIA]['versao'], 1)
+
+    def test_horario_seguinte_ocupado_cancela_toda_a_reserva(self):
+        self.backend.reservar_agendamento(self.data_obj, "09:30", "Ana", "", ["Social"], "Aluizio")
+        with self.assertRaises(self.backend.HorarioIndisponivel):
+            self.backend.reservar_agendamento(self.data_obj, "09:00", "Bia", "", ["Social", "Barba"], "Aluizio")
+
+        self.assertNotIn(f"{DIA}_09:00_Aluizio", self.agendamentos())
+        self.assertNotIn(f"{DIA}_09:30_Aluizio_BLOQUEADO", self.agendamentos())
+
+    def test_corte_e_barba_no_ultimo_horario_nao_cria_bloqueio_fora_da_grade(self):
+        with self.assertRaises(self.backend.HorarioIndisponivel):
+            self.backend.reservar_agendamento(self.data_obj, "19:30", "Ana", "", ["Social", "Barba"], "Aluizio")
+
+        self.assertEqual(self.agendamentos(), {})
+        self.assertNotIn(DIA, self.banco.colecao('agendamentos_versoes'))
+
+
+if __name__ == '__main__':
+    unittest.main()
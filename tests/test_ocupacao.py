@@ -0,0 +1,113 @@
+"""
+Testes do calendário de ocupação do mês (backend.ocupacao_do_mes).
+"""
+import os
+import unittest
+from datetime import date
+from unittest import mock
+
+from dubles import BancoFalso, carregar_backend
+
+SEGUNDA = date(2030, 3, 4)
+
+
+class OcupacaoDoMesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.banco = BancoFalso()
+        self.backend = carregar_backend(self.banco)
+        self.ambiente = mock.patch.dict(os.environ, {'BARRAMENTO_INVALIDACAO': 'local'})
+        self.ambiente.start()
+        self.addCleanup(self.ambiente.stop)
+
+    def ocupacao(self, data_obj=SEGUNDA):
+        return self.backend.ocupacao_do_mes(data_obj.year, data_obj.month)[data_obj]
+
+    def test_dia_vazio_desconta_almoco_e_horarios_fixos(self):
+        # 24 horários, menos 4 de almoço; Lucas Borges ainda não atende às 08:00
+        self.assertEqual(self.ocupacao(), {'Aluizio': (0, 20), 'Lucas Borges': (0, 19)})
+        self.assertEqual(self.ocupacao(date(2030, 3, 3)), {'Aluizio': (0, 0), 'Lucas Borges': (0, 0)})  # Domingo
+
+    def test_agendamento_conta_como_agendado(self):
+        self.backend.reservar_agendamento(SEGUNDA, "09:00", "Ana", "", ["Social", "Barba"], "Aluizio")
+        # O bloqueio de Corte+Barba tira um horário livre, mas não é um agendamento
+        self.assertEqual(self.ocupacao()['Aluizio'], (1, 18))
+
+    def test_fechamento_por_documento_nao_conta_como_agendado(self):
+        self.backend.fechar_horarios(SEGUNDA, self.backend.horarios_tabela, "Aluizio")
+        self.assertEqual(self.ocupacao(), {'Aluizio': (0, 0), 'Lucas Borges': (0, 19)})
+
+    def test_fechamento_no_almoco_nao_muda_os_livres(self):
+        self.backend.fechar_horarios(SEGUNDA, ["12:00", "12:30"], "Aluizio")
+        self.assertEqual(self.ocupacao()['Aluizio'], (0, 20))
+
+    def test_regra_recorrente_usa_a_mesma_sobreposicao_da_grade(self):
+        self.banco.colecao('regras_fechamento')['r1'] = {
+            'barbeiro': "Aluizio", 'horario_inicio': "14:00", 'horario_fim': "19:30",
+            'data_inicio': "2030-01-01", 'data_fim': None, 'dias_semana': [0], 'excecoes': []
+        }
+        self.assertEqual(self.ocupacao()['Aluizio'], (0, 8))
+
+    def test_segunda_renderizacao_nao_faz_leituras(self):
+        self.backend.reservar_agendamento(SEGUNDA, "09:00", "Ana", "", ["Social"], "Aluizio")
+        self.ocupacao()
+
+        leituras = self.banco.leituras
+        self.assertEqual(self.ocupacao()['Aluizio'], (1, 19))
+        self.assertEqual(self.banco.leituras, leituras)
+
+    def test_gravacao_atualiza_o_dia_no_calendario(self):
+        self.ocupacao()
+        self.backend.reservar_agendamento(SEGUNDA, "09:00", "Ana", "", ["Social"], "Aluizio")
+        self.assertEqual(self.ocupacao()['Aluizio'], (1, 19))
+
+    def test_dia_ja_carregado_pela_grade_e_reaproveitado(self):
+        self.backend.reservar_agendamento(SEGUNDA, "09:00", "Ana", "", ["Social"], "Aluizio")
+        self.backend.buscar_agendamentos_do_dia(SEGUNDA)
+
+        leituras = self.banco.leituras
+        self.ocupacao()
+        # Os outros 30 dias vêm do get_all; a segunda-feira sai do cache da grade
+        self.assertEqual(self.banco.leituras - leituras, 30 + 2)  # + versão e documentos das regras
+
+    def test_dias_passados_ficam_em_cache_depois_da_idade_maxima(self):
+        passado, futuro = date(2020, 3, 2), SEGUNDA
+        self.ocupacao(passado)
+        self.ocupacao(futuro)
+        with mock.patch.object(self.backend, 'CACHE_IDADE_MAXIMA', 0):
+            leituras = self.banco.leituras
+            self.ocupacao(passado)
+            self.assertEqual(self.banco.leituras - leituras, 1)  # só a versão das regras
+            leituras = self.banco.leituras
+            self.ocupacao(futuro)
+            self.assertEqual(self.banco.leituras - leituras, 31 + 1)
+
+    def test_navegar_pelos_meses_nao_grava_nada(self):
+        for mes in range(1, 13):
+            self.backend.ocupacao_do_mes(2031, mes)
+        self.assertEqual(self.banco.colecao('agendamentos_resumos'), {})
+        self.assertEqual(self.banco.colecao('agendamentos_versoes'), {})
+
+    def test_resumo_fica_fora_do_documento_de_versao(self):
+        self.backend.reservar_agendamento(SEGUNDA, "09:00", "Ana", "", ["Social", "Barba"], "Aluizio")
+        self.assertEqual(set(self.banco.colecao('agendamentos_versoes')['2030-03-04']), {'versao', 'updated_at'})
+        self.assertEqual(self.banco.colecao('agendamentos_resumos')['2030-03-04']['horarios'],
+                         {'09:00_Aluizio': "Agendamento", '09:30_Aluizio_BLOQUEADO': "BLOQUEADO"})
+
+    def test_migracao_resume_so_os_dias_com_documentos(self):
+        # Dia gravado antes dos resumos existirem
+        self.banco.colecao('agendamentos')["2030-03-04_10:00_Lucas Borges"] = {'nome': "Bia", 'barbeiro': "Lucas Borges"}
+        with mock.patch('builtins.print'):
+            self.assertEqual(self.backend.migrar_resumos_dos_dias(), 1)
+            self.assertEqual(self.backend.migrar_resumos_dos_dias(), 0)
+
+        self.assertEqual(list(self.banco.colecao('agendamentos_resumos')), ['2030-03-04'])
+        self.assertEqual(self.ocupacao()['Lucas Borges'], (1, 18))
+
+    def test_primeira_gravacao_de_um_dia_antigo_monta_o_resumo(self):
+        self.banco.colecao('agendamentos')["2030-03-04_10:00_Lucas Borges"] = {'nome': "Bia", 'barbeiro': "Lucas Borges"}
+        self.backend.reservar_agendamento(SEGUNDA, "09:00", "Ana", "", ["Social"], "Aluizio")
+        self.assertEqual(self.ocupacao(), {'Aluizio': (1, 19), 'Lucas Borges': (1, 18)})
+
+if __name__ == '__main__':
+    unittest.main()
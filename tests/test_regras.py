@@ -0,0 +1,66 @@
+"""
+Testes das regras de fechamento recorrentes (backend.py).
+"""
+import os
+import unittest
+from datetime import date, timedelta
+from unittest import mock
+
+from dubles import BancoFalso, carregar_backend
+
+SEGUNDA = date(2030, 3, 4)
+
+
+class RegrasDeFechamentoTest(unittest.TestCase):
+
+    def setUp(self):
+        self.banco = BancoFalso()
+        self.backend = carregar_backend(self.banco)
+        self.ambiente = mock.patch.dict(os.environ, {'BARRAMENTO_INVALIDACAO': 'local'})
+        self.ambiente.start()
+        self.addCleanup(self.ambiente.stop)
+        # Fecha as segundas das 14:00 às 15:00 para o Aluizio
+        self.assertTrue(self.backend.criar_regra_fechamento("Aluizio", "14:00", "15:00", date(2030, 1, 1), dias_semana=[0]))
+        self.regra_id, = self.banco.colecao('regras_fechamento')
+
+    def status(self, data_obj, horario, barbeiro="Aluizio"):
+        """ Status do horário como a grade calcula (documentos do dia + regras). """
+        mapa = self.backend.aplicar_regras_fechamento(
+            data_obj, self.backend.buscar_agendamentos_do_dia(data_obj), self.backend.carregar_regras_fechamento())
+        return self.backend.calcular_status_horario(data_obj, horario, barbeiro, mapa)[:2]
+
+    def test_regra_criada_fecha_os_horarios_na_grade(self):
+        self.assertEqual(self.status(SEGUNDA, "14:30"), ("fechado", "Fechado"))
+        self.assertEqual(self.status(SEGUNDA, "15:30")[0], "disponivel")
+        self.assertEqual(self.status(SEGUNDA, "14:30", "Lucas Borges")[0], "disponivel")
+        self.assertEqual(self.status(SEGUNDA + timedelta(days=1), "14:30")[0], "disponivel")  # Terça
+        self.assertFalse(self.backend.verificar_disponibilidade_especifica(SEGUNDA, "14:30", "Aluizio"))
+
+    def test_excecao_libera_so_a_data_informada(self):
+        self.status(SEGUNDA, "14:30")  # regras em cache antes da alteração
+        self.assertTrue(self.backend.adicionar_excecao_regra(self.regra_id, SEGUNDA))
+
+        self.assertEqual(self.status(SEGUNDA, "14:30")[0], "disponivel")
+        self.assertEqual(self.status(SEGUNDA + timedelta(days=7), "14:30")[0], "fechado")
+        self.assertEqual(self.banco.colecao('regras_fechamento')[self.regra_id]['excecoes'], [SEGUNDA.strftime('%Y-%m-%d')])
+
+    def test_documento_do_horario_tem_prioridade_sobre_a_regra(self):
+        self.backend.reservar_agendamento(SEGUNDA, "14:30", "Ana", "", ["Social"], "Aluizio")
+        self.assertEqual(self.status(SEGUNDA, "14:30"), ("ocupado", "Ana"))
+        self.assertEqual(self.status(SEGUNDA, "14:00")[0], "fechado")
+
+    def test_excecao_em_regra_excluida_nao_recria_a_regra(self):
+        self.assertTrue(self.backend.excluir_regra_fechamento(self.regra_id))
+        versao_regras = self.banco.colecao('agendamentos_versoes')['regras_fechamento']['versao']
+
+        with mock.patch.object(self.backend.st, 'error') as erro:
+            self.assertFalse(self.backend.adicionar_excecao_regra(self.regra_id, SEGUNDA))
+        erro.assert_called_once_with("Esta regra já foi excluída. Atualize a página.")
+
+        self.assertEqual(self.banco.colecao('regras_fechamento'), {})
+        self.assertEqual(self.banco.colecao('agendamentos_versoes')['regras_fechamento']['versao'], versao_regras)
+        self.assertEqual(self.status(SEGUNDA, "14:30")[0], "disponivel")
+
+
+if __name__ == '__main__':
+    unittest.main()